@@ -1,31 +1,121 @@
-from flask import Flask, render_template, request
-from sdes import decrypt_3DES, chunk, binary_to_ascii
+import binascii
+from flask import Flask, Response, render_template, request, abort, jsonify, stream_with_context
+from sdes import bits_to_val, decrypt_3DES_int
+from jobs import CrackJobs, JobQueueFull
 
 app = Flask(__name__)
 
 RAW_KEY_1 = [1,0,0,0,1,0,1,1,1,0]
 RAW_KEY_2 = [0,1,1,0,1,0,1,1,1,0]
 
+# TripleSDES decryption table of the configured key only, built once at startup
+KEY = (bits_to_val(RAW_KEY_1) << 10) | bits_to_val(RAW_KEY_2)
+DECRYPT_TABLE = bytes(decrypt_3DES_int(KEY, b) for b in range(256))
+STREAM_CHUNK = 2**16 # Larger payloads are streamed in chunks of this size
+OCTET_STREAM = 'application/octet-stream'
+
+jobs = CrackJobs(max_workers=4)
+
+
+def parse_bits(s):
+    """Converts a string of '0'/'1' into bytes"""
+    s = ''.join(s.split())
+    if len(s) % 8 or set(s) - {'0', '1'}:
+        abort(400, 'ciphertext must be a bit string with a length divisible by 8')
+    if not s:
+        return b''
+    return int(s, 2).to_bytes(len(s) // 8, 'big')
+
+def parse_body(fmt):
+    data = request.get_data()
+    if fmt == 'hex':
+        try:
+            return binascii.unhexlify(b''.join(data.split()))
+        except binascii.Error:
+            abort(400, 'ciphertext is not valid hex')
+    if fmt == 'bits':
+        return parse_bits(data.decode('ascii', errors='replace'))
+    return data
+
+def decrypt(data):
+    return data.translate(DECRYPT_TABLE)
+
+def decrypt_stream(stream):
+    """Decrypts a file-like body chunk by chunk"""
+    while True:
+        buf = stream.read(STREAM_CHUNK)
+        if not buf:
+            return
+        yield decrypt(buf)
+
+def decrypt_response(data, binary=True):
+    """Plaintext of data as raw bytes, or as latin-1 text for the legacy GET"""
+    chunks = (decrypt(data[i:i+STREAM_CHUNK]) for i in range(0, len(data), STREAM_CHUNK))
+    if not binary:
+        chunks = (chunk.decode('latin-1') for chunk in chunks)
+        return ''.join(chunks) if len(data) <= STREAM_CHUNK else Response(chunks)
+    if len(data) <= STREAM_CHUNK:
+        return Response(b''.join(chunks), mimetype=OCTET_STREAM)
+    return Response(chunks, mimetype=OCTET_STREAM)
+
 
 @app.route('/')
 def hello():
     return render_template('index.html')
 
-@app.route('/cipher', methods=['GET'])
+@app.route('/cipher', methods=['GET', 'POST'])
 def cipher():
-    ciphertext = request.args.get('ciphertext')
-    ciphertext = [int(i) for i in ciphertext]
-    chunks = chunk(ciphertext, n=8)
-    
-    key = RAW_KEY_1 + RAW_KEY_2
-    dec = [decrypt_3DES(key, chnk) for chnk in chunks]
-    plaintext = []
-    for _chnk in dec:
-        dec_str = ''.join(str(i) for i in _chnk)
-        plaintext.append(dec_str)
-    plaintext = ''.join(plaintext)
-    plaintext = binary_to_ascii(plaintext)
-    return plaintext
+    """Decrypts a TripleSDES ciphertext with the configured key
+
+    GET takes the ciphertext as a bit string in the ciphertext query
+    argument and answers with text. POST takes it in the body, as raw bytes
+    (default, streamed) or as hex/bits when the format query argument says
+    so, and answers with the raw plaintext bytes.
+    """
+    if request.method == 'GET':
+        return decrypt_response(parse_bits(request.args.get('ciphertext', '')), binary=False)
+    fmt = request.args.get('format', 'raw')
+    if fmt not in ('raw', 'hex', 'bits'):
+        abort(400, 'format must be raw, hex or bits')
+    if fmt == 'raw':
+        return Response(stream_with_context(decrypt_stream(request.stream)), mimetype=OCTET_STREAM)
+    return decrypt_response(parse_body(fmt))
+
+@app.route('/crack', methods=['POST'])
+def crack():
+    """Submits a key search, JSON body {"ciphertext": ..., "cipher": "sdes"|"3des"}
+
+    The ciphertext is a bit string, or hex when "format" is "hex". Returns
+    the job id to poll at /crack/<job_id>.
+    """
+    body = request.get_json(silent=True) or {}
+    if not isinstance(body, dict):
+        abort(400, 'body must be a JSON object')
+    ciphertext = body.get('ciphertext', '')
+    if not isinstance(ciphertext, str):
+        abort(400, 'ciphertext must be a string')
+    if body.get('format', 'bits') == 'hex':
+        try:
+            data = bytes.fromhex(ciphertext)
+        except ValueError:
+            abort(400, 'ciphertext is not valid hex')
+    else:
+        data = parse_bits(ciphertext)
+    try:
+        job_id = jobs.submit(body.get('cipher', 'sdes'), data)
+    except ValueError as e:
+        abort(400, str(e))
+    except JobQueueFull as e:
+        abort(503, str(e))
+    return jsonify({'id': job_id, 'status_url': f'/crack/{job_id}'}), 202
+
+@app.route('/crack/<job_id>', methods=['GET'])
+def crack_status(job_id):
+    """Progress (keys tried, keys/s, ETA) of a job, and its results when done"""
+    status = jobs.status(job_id)
+    if status is None:
+        abort(404)
+    return jsonify(status)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,262 @@
+import os
+import sys
+import json
+import time
+import fnmatch
+import argparse
+import platform
+import resource
+import subprocess
+import tracemalloc
+import sdes
+
+BENCHMARKS = []
+
+
+def benchmark(name, unit, higher_is_better=False):
+    """Registers fn as a benchmark, fn(quick) returning its measured value"""
+    def register(fn):
+        BENCHMARKS.append((name, unit, higher_is_better, fn))
+        return fn
+    return register
+
+def best_time(fn, repeat=5):
+    """Best wall time of repeat calls of fn"""
+    times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start_time)
+    return min(times)
+
+def peak_memory(fn):
+    """Peak Python heap allocation (bytes) during one call of fn"""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def ctx_bytes(name):
+    return bytes(sdes.bits_to_val(c) for c in sdes.load_ciphertext(name))
+
+K = 642
+K1, K2 = 558, 430
+BLOCK = [1,0,1,0,1,0,1,0]
+KEY = sdes.val_to_bits(K, return_len=10)
+KEY_3DES = sdes.val_to_bits(K1, return_len=10) + sdes.val_to_bits(K2, return_len=10)
+
+
+# Single block latency (seconds per block)
+@benchmark('block.encrypt.reference', 's')
+def block_encrypt_reference(quick):
+    return best_time(lambda: [sdes.encrypt(KEY, BLOCK) for _ in range(1000)]) / 1000
+
+@benchmark('block.decrypt.reference', 's')
+def block_decrypt_reference(quick):
+    return best_time(lambda: [sdes.decrypt(KEY, BLOCK) for _ in range(1000)]) / 1000
+
+@benchmark('block.encrypt.int', 's')
+def block_encrypt_int(quick):
+    return best_time(lambda: [sdes.encrypt_int(K, 0xaa) for _ in range(1000)]) / 1000
+
+@benchmark('block.decrypt.int', 's')
+def block_decrypt_int(quick):
+    return best_time(lambda: [sdes.decrypt_int(K, 0xaa) for _ in range(1000)]) / 1000
+
+
+# Bulk throughput (bytes per second)
+def bulk_reference(fn, n):
+    chunks = sdes.chunk(sdes.bytes_to_bits(os.urandom(n)))
+    return n / best_time(lambda: [fn(c) for c in chunks], repeat=3)
+
+def bulk_bytes(fn, n):
+    data = os.urandom(n)
+    return n / best_time(lambda: fn(data))
+
+@benchmark('bulk.encrypt.reference', 'B/s', higher_is_better=True)
+def bulk_encrypt_reference(quick):
+    return bulk_reference(lambda c: sdes.encrypt(KEY, c), 2**10 if quick else 2**13)
+
+@benchmark('bulk.decrypt.reference', 'B/s', higher_is_better=True)
+def bulk_decrypt_reference(quick):
+    return bulk_reference(lambda c: sdes.decrypt(KEY, c), 2**10 if quick else 2**13)
+
+@benchmark('bulk.encrypt_3DES.reference', 'B/s', higher_is_better=True)
+def bulk_encrypt_3des_reference(quick):
+    return bulk_reference(lambda c: sdes.encrypt_3DES(KEY_3DES[:10], KEY_3DES[10:], c), 2**9 if quick else 2**12)
+
+@benchmark('bulk.decrypt_3DES.reference', 'B/s', higher_is_better=True)
+def bulk_decrypt_3des_reference(quick):
+    return bulk_reference(lambda c: sdes.decrypt_3DES(KEY_3DES, c), 2**9 if quick else 2**12)
+
+@benchmark('bulk.encrypt.bytes', 'B/s', higher_is_better=True)
+def bulk_encrypt_bytes(quick):
+    return bulk_bytes(lambda d: sdes.encrypt_bytes(K, d), 2**20 if quick else 2**24)
+
+@benchmark('bulk.decrypt.bytes', 'B/s', higher_is_better=True)
+def bulk_decrypt_bytes(quick):
+    return bulk_bytes(lambda d: sdes.decrypt_bytes(K, d), 2**20 if quick else 2**24)
+
+@benchmark('bulk.encrypt_3DES.bytes', 'B/s', higher_is_better=True)
+def bulk_encrypt_3des_bytes(quick):
+    return bulk_bytes(lambda d: sdes.encrypt_3DES_bytes(K1, K2, d), 2**20 if quick else 2**24)
+
+@benchmark('bulk.decrypt_3DES.bytes', 'B/s', higher_is_better=True)
+def bulk_decrypt_3des_bytes(quick):
+    return bulk_bytes(lambda d: sdes.decrypt_3DES_bytes((K1 << 10) | K2, d), 2**20 if quick else 2**24)
+
+@benchmark('bulk.decrypt_3DES.codebook', 'B/s', higher_is_better=True)
+def bulk_decrypt_3des_codebook(quick):
+    return bulk_bytes(lambda d: sdes.codebook_decrypt_3DES((K1 << 10) | K2, d), 2**20 if quick else 2**24)
+
+
+# Cracking (seconds per crack)
+def crack_ctx1_reference():
+    chunks = sdes.load_ciphertext('CTX1.txt')
+    for i in range(2**10):
+        if sdes.key_check(sdes.val_to_bits(i, return_len=10), chunks):
+            return i
+
+@benchmark('crack.ctx1.reference', 's')
+def crack_ctx1_reference_time(quick):
+    return best_time(crack_ctx1_reference, repeat=1 if quick else 3)
+
+@benchmark('crack.ctx1.vectorized', 's')
+def crack_ctx1_vectorized(quick):
+    data = ctx_bytes('CTX1.txt')
+    return best_time(lambda: sdes.crack_sdes(data))
+
+@benchmark('crack.ctx1.bitsliced', 's')
+def crack_ctx1_bitsliced(quick):
+    data = ctx_bytes('CTX1.txt')
+    return best_time(lambda: sdes.key_check_bitsliced(data))
+
+@benchmark('crack.ctx2.mitm', 's')
+def crack_ctx2_mitm(quick):
+    data = ctx_bytes('CTX2.txt')
+    return best_time(lambda: sdes.crack_3des_mitm(data, b'simp'), repeat=1 if quick else 3)
+
+@benchmark('crack.ctx2.bitsliced', 's')
+def crack_ctx2_bitsliced(quick):
+    data = ctx_bytes('CTX2.txt')
+    return best_time(lambda: sdes.key_check_3des_bitsliced(data), repeat=1 if quick else 3)
+
+
+# Import cost of the modules in a fresh interpreter
+IMPORT_CODE = ('import time, resource; start_time = time.perf_counter(); import {module}; '
+               'print(time.perf_counter() - start_time, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)')
+
+def measure_import(module):
+    """(seconds, max rss in KB) of importing module in a new process"""
+    out = subprocess.run([sys.executable, '-c', IMPORT_CODE.format(module=module)],
+                         cwd=os.path.dirname(os.path.abspath(__file__)),
+                         capture_output=True, text=True, check=True).stdout.split()
+    return float(out[0]), int(out[1])
+
+def import_benchmarks(module):
+    @benchmark(f'import.{module}', 's')
+    def import_time(quick):
+        return min(measure_import(module)[0] for _ in range(1 if quick else 5))
+
+    @benchmark(f'import.{module}.max_rss', 'KB')
+    def import_rss(quick):
+        return min(measure_import(module)[1] for _ in range(1 if quick else 3))
+
+for module in ('sdes', 'app', 'kasiski'):
+    import_benchmarks(module)
+
+
+def worker_benchmark(workers):
+    """keys/s of the multiprocessing TripleSDES search with a given worker count"""
+    def run(quick):
+        chunks = sdes.load_ciphertext('CTX2.txt')
+        n = 2**13 if quick else 2**16
+        elapsed = best_time(lambda: sdes.search_3des(chunks, 0, n, processes=workers, range_size=2**10,
+                                                     progress=None), repeat=1)
+        return n / elapsed
+    run.pool_memory = lambda: pool_memory(workers)
+    return run
+
+POOL_MEMORY_CODE = ('import resource, benchmark; benchmark.worker_benchmark({workers})(True); '
+                    'print(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)')
+
+def pool_memory(workers):
+    """Largest max RSS (bytes) of the pool workers of one quick search_3des run
+
+    tracemalloc only sees this process and RUSAGE_CHILDREN covers every
+    child reaped so far, so the search runs in a fresh process whose only
+    children are its pool workers.
+    """
+    out = subprocess.run([sys.executable, '-c', POOL_MEMORY_CODE.format(workers=workers)],
+                         cwd=os.path.dirname(os.path.abspath(__file__)),
+                         capture_output=True, text=True, check=True).stdout
+    return int(out.split()[-1]) * 1024
+
+
+def run(pattern='*', quick=False, workers=(1, 2, 4)):
+    benchmarks = BENCHMARKS + [(f'search_3des.workers_{w}', 'keys/s', True, worker_benchmark(w)) for w in workers]
+    results = {}
+    for name, unit, higher_is_better, fn in benchmarks:
+        if not fnmatch.fnmatch(name, pattern):
+            continue
+        fn(quick) # Warm up tables and caches
+        value = fn(quick)
+        pool = hasattr(fn, 'pool_memory')
+        memory = fn.pool_memory() if pool else peak_memory(lambda: fn(True))
+        results[name] = {'value': value, 'unit': unit, 'higher_is_better': higher_is_better,
+                         'peak_memory': memory,
+                         'memory_source': 'worker_max_rss' if pool else 'tracemalloc'}
+        print(f'{name:36s} {value:14.6g} {unit:7s} peak {memory / 2**20:8.2f} MB', file=sys.stderr)
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'results': results,
+    }
+
+def compare(results, baseline, threshold):
+    """Names of the benchmarks that regressed more than threshold (a fraction) against baseline"""
+    regressions = []
+    for name, base in baseline['results'].items():
+        current = results['results'].get(name)
+        if current is None or not base['value']:
+            continue
+        if base['higher_is_better']:
+            change = (base['value'] - current['value']) / base['value']
+        else:
+            change = (current['value'] - base['value']) / base['value']
+        if change > threshold:
+            regressions.append((name, change))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks of the S-DES engines and crackers, and of importing the modules')
+    parser.add_argument('--only', default='*', help='Glob of benchmark names to run, e.g. "crack.*"')
+    parser.add_argument('--quick', action='store_true', help='Smaller inputs and fewer repeats')
+    parser.add_argument('--workers', type=int, nargs='*', default=[1, 2, 4])
+    parser.add_argument('--output', help='Write the JSON results here instead of stdout')
+    parser.add_argument('--baseline', help='JSON results to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Allowed regression, 0.25 = 25%%')
+    args = parser.parse_args()
+
+    results = run(args.only, args.quick, args.workers)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for name, change in regressions:
+            print(f'REGRESSION {name}: {change:.0%} worse than baseline', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
@@ -0,0 +1,149 @@
+import time
+import uuid
+import collections
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from sdes import val_to_bits, crack_sdes, key_check_3des_bitsliced
+
+KEY_SPACE = {'sdes': 2**10, '3des': 2**20}
+BATCH = 2**14 # TripleSDES keys searched between progress updates
+MAX_RESULTS = 100 # Matching keys kept per job, short ciphertexts match many keys
+FINISHED_TTL = 3600 # Seconds a finished job stays available
+MAX_FINISHED = 1000 # Finished jobs kept at most
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+def run_crack(cipher, data, progress, job_id):
+    """Searches the whole key space of cipher for letters only plaintexts of data
+
+    Runs in a pool worker and stores (keys tried, seconds spent) in the
+    shared progress dict after every batch. Returns the first MAX_RESULTS
+    matches and the number of matches.
+    """
+    start_time = time.time()
+    if cipher == 'sdes':
+        found = crack_sdes(data)
+        progress[job_id] = (KEY_SPACE[cipher], time.time() - start_time)
+        return found[:MAX_RESULTS], len(found)
+    found = []
+    total = 0
+    for i in range(0, KEY_SPACE[cipher], BATCH):
+        batch = key_check_3des_bitsliced(data, start=i, stop=i+BATCH, batch=BATCH)
+        found += batch[:MAX_RESULTS - len(found)]
+        total += len(batch)
+        progress[job_id] = (i + BATCH, time.time() - start_time)
+    return found, total
+
+
+class CrackJobs:
+    """Bounded queue of cracking jobs running on a process pool
+
+    Args:
+        max_workers: Number of worker processes, defaults to the cpu count.
+        max_pending: Jobs that may wait or run at once, submit raises
+            JobQueueFull beyond that.
+        finished_ttl: Seconds a finished job and its results are kept.
+        max_finished: Finished jobs kept at most, the oldest are dropped
+            first. Dropped jobs are unknown to status.
+    """
+    def __init__(self, max_workers=None, max_pending=32, finished_ttl=FINISHED_TTL, max_finished=MAX_FINISHED):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.finished_ttl = finished_ttl
+        self.max_finished = max_finished
+        self.jobs = {}
+        self.running = set() # Ids of the jobs not finished yet
+        self.finished = collections.OrderedDict() # job id -> time finished, oldest first
+        self.lock = threading.RLock() # Done callbacks may run inside submit
+        self.executor = None
+        self.manager = None
+        self.progress = None
+
+    def _start(self):
+        if self.executor is None:
+            self.manager = multiprocessing.Manager()
+            self.progress = self.manager.dict()
+            self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+
+    def pending(self):
+        return len(self.running)
+
+    def _done(self, job_id):
+        with self.lock:
+            self.running.discard(job_id)
+            self.finished[job_id] = time.time()
+
+    def evict(self):
+        """Forgets finished jobs older than finished_ttl, and the oldest beyond max_finished"""
+        with self.lock:
+            now = time.time()
+            while self.finished:
+                job_id, finished = next(iter(self.finished.items()))
+                if now - finished <= self.finished_ttl and len(self.finished) <= self.max_finished:
+                    break
+                del self.finished[job_id]
+                del self.jobs[job_id]
+                self.progress.pop(job_id, None)
+
+    def submit(self, cipher, data):
+        if cipher not in KEY_SPACE:
+            raise ValueError(f'cipher must be one of {list(KEY_SPACE)}')
+        if not data:
+            raise ValueError('ciphertext must not be empty')
+        with self.lock:
+            self.evict()
+            if self.pending() >= self.max_pending:
+                raise JobQueueFull(f'{self.max_pending} jobs are already pending')
+            self._start()
+            job_id = uuid.uuid4().hex
+            future = self.executor.submit(run_crack, cipher, bytes(data), self.progress, job_id)
+            self.jobs[job_id] = {'cipher': cipher, 'future': future, 'submitted': time.time()}
+            self.running.add(job_id)
+            future.add_done_callback(lambda _: self._done(job_id))
+        return job_id
+
+    def status(self, job_id):
+        """Progress of a job as a JSON serializable dict, None for unknown or evicted ids"""
+        self.evict()
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        future = job['future']
+        total = KEY_SPACE[job['cipher']]
+        tried, elapsed = self.progress.get(job_id, (0, 0))
+        rate = tried / elapsed if elapsed > 0 else None
+        res = {
+            'id': job_id,
+            'cipher': job['cipher'],
+            'status': 'queued',
+            'keys_tried': tried,
+            'keys_total': total,
+            'keys_per_sec': rate,
+            'eta': (total - tried) / rate if rate else None,
+        }
+        if future.done():
+            if future.exception() is not None:
+                res['status'] = 'failed'
+                res['error'] = str(future.exception())
+            else:
+                key_len = 10 if job['cipher'] == 'sdes' else 20
+                found, total = future.result()
+                res['status'] = 'done'
+                res['eta'] = 0
+                res['results'] = [{'key': ''.join(str(b) for b in val_to_bits(K, return_len=key_len)),
+                                   'plaintext': plaintext} for K, plaintext in found]
+                res['results_total'] = total
+                res['results_truncated'] = total > len(found)
+        elif future.running():
+            res['status'] = 'running'
+        return res
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.manager.shutdown()
+            self.executor = None
@@ -1,17 +1,58 @@
 import os
+import re
 import string
+import functools
+import heapq
 import itertools
-from nltk.corpus import stopwords
+import numpy as np
+from multiprocessing import Pool
 import time
 
 ALPHABET = string.ascii_uppercase
-STOPWORDS = stopwords.words('english')
-STOPWORDS = [w.upper() for w in STOPWORDS if len(w) > 2]
 MAX_KEY_LEN = 10
-EN_WF = [8.167, 1.492, 2.782, 4.253, 12.702, 2.228, 2.015, 6.094, 6.966, 0.153, 0.772, 4.025, 2.406,
-         6.749, 7.507, 1.929, 0.095, 5.987, 6.327, 9.056, 2.758, 0.978,2.360, 0.150, 1.974, 0.074]
+CHUNK_SIZE = 2**20 # Characters per chunk when streaming files
+MAX_CANDIDATES = 1000 # Most probable keys compared by stopword count
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+STOPWORDS_FILE = os.path.join(DATA_DIR, 'stopwords_english.txt') # NLTK's English stopword list
+LETTER_FREQUENCIES_FILE = os.path.join(DATA_DIR, 'letter_frequencies.txt') # Percent per letter
+CORPUS_FILE = os.path.join(DATA_DIR, 'english_corpus.txt')
+QUADGRAM_FILE = os.path.join(DATA_DIR, 'quadgrams.npz') # Quadgram counts of CORPUS_FILE
+
+
+# Language resources are read from DATA_DIR on first use, not at import
+@functools.lru_cache(maxsize=None)
+def get_stopwords(source='bundled'):
+    """Uppercase English stopwords longer than two letters
+
+    Args:
+        source: 'bundled' reads STOPWORDS_FILE, 'nltk' asks the NLTK corpus
+            (needs nltk and its downloaded stopwords).
+    """
+    if source == 'nltk':
+        from nltk.corpus import stopwords
+        words = stopwords.words('english')
+    else:
+        with open(STOPWORDS_FILE) as f:
+            words = f.read().split()
+    return frozenset(w.upper() for w in words if len(w) > 2)
+
+@functools.lru_cache(maxsize=None)
+def get_letter_frequencies():
+    """Relative frequency of every letter A-Z in English, as a read only array"""
+    with open(LETTER_FREQUENCIES_FILE) as f:
+        freqs = dict(line.split() for line in f)
+    en_wf = np.array([float(freqs[w]) / 100 for w in ALPHABET])
+    en_wf.flags.writeable = False
+    return en_wf
+
+def __getattr__(name):
+    # STOPWORDS and EN_WF stay available as module attributes, loaded lazily
+    if name == 'STOPWORDS':
+        return get_stopwords()
+    if name == 'EN_WF':
+        return get_letter_frequencies().tolist()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
-EN_WF = [i/100 for i in EN_WF]
 
 def get_ngram(s, n):
     """Get list of all character level ngrams in a given string
@@ -59,12 +100,51 @@ def get_ngram_distances(ngram):
         A list of all distances between similar items in
         the ngram sequence
     """
+    pos_idx = {}
+    for i, item in enumerate(ngram):
+        pos_idx.setdefault(item, []).append(i)
     res = []
-    for item in set(ngram):
-        # Get the position index for all occurences of a ngram
-        pos_idx = [i for i,_ngram in enumerate(ngram) if _ngram==item] 
-        if len(pos_idx) > 1:
-            res = res + get_distances(pos_idx)
+    for idx in pos_idx.values():
+        if len(idx) > 1:
+            res += get_distances(idx)
+    return res
+
+def get_repeated_ngrams(doc, max_len, min_len=2):
+    """Get the positions of all repeated ngrams of length min_len..max_len
+
+    A repeated ngram of length n+1 always starts with a repeated ngram of
+    length n, so the position index of the shortest ngrams is built once and
+    each following length only regroups the positions that still repeat by
+    their next character.
+
+    Args:
+        doc: Input string.
+        max_len: Longest ngram length.
+        min_len: Shortest ngram length.
+
+    Returns:
+        A dict {n: groups} where every group is the sorted list of positions
+        of one ngram of length n occurring more than once.
+        Ex. doc="ABCXABCYAB" => {2: [[0, 4, 8], [1, 5]], 3: [[0, 4]]}
+    """
+    pos_idx = {}
+    for i in range(len(doc) - min_len + 1):
+        pos_idx.setdefault(doc[i:i+min_len], []).append(i)
+    groups = [idx for idx in pos_idx.values() if len(idx) > 1]
+
+    res = {}
+    n = min_len
+    while groups and n <= max_len:
+        res[n] = groups
+        next_groups = []
+        for idx in groups:
+            ext = {}
+            for i in idx:
+                if i + n < len(doc):
+                    ext.setdefault(doc[i+n], []).append(i)
+            next_groups += [_idx for _idx in ext.values() if len(_idx) > 1]
+        groups = next_groups
+        n += 1
     return res
 
 
@@ -72,19 +152,140 @@ def get_factors(n, limit):
     return [x for x in range(1, n+1) if n % x == 0 and x != 1 and x <= limit]
 
 
+SMALL_GROUP = 16 # Repeats occurring at most this often have their distances listed
+
+
+def get_distance_histogram(groups, length):
+    """Histogram of the pairwise distances within every group of positions
+
+    Args:
+        groups: Lists of sorted positions, each with at most SMALL_GROUP items.
+        length: Upper bound of the distances (length of the document).
+
+    Returns:
+        Array hist where hist[d] is the number of pairs at distance d.
+    """
+    hist = np.zeros(length + 1, dtype=np.int64)
+    by_size = {}
+    for idx in groups:
+        by_size.setdefault(len(idx), []).append(idx)
+    for size, _groups in by_size.items():
+        pos = np.array(_groups, dtype=np.int64) # One row per group
+        i, j = np.triu_indices(size, k=1)
+        hist += np.bincount((pos[:, j] - pos[:, i]).ravel(), minlength=length + 1)
+    return hist
+
+def get_factor_frequencies(repeats, max_len, length):
+    """Count the ngram distances divisible by every candidate key length
+
+    Distances of the ngrams that repeat a few times go into one histogram,
+    and the count for a key length k is the sum over its multiples
+    (hist[k::k]), which replaces listing the factors of every distance.
+    For ngrams repeating more often, the pairs at a distance divisible by k
+    are the pairs in the same residue class mod k, so each class with c
+    positions adds c*(c-1)/2 without enumerating the pairs (see
+    count_residue_pairs).
+
+    Args:
+        repeats: Output of get_repeated_ngrams.
+        max_len: Longest candidate key length.
+        length: Length of the document.
+
+    Returns:
+        Array freqs where freqs[k] is the count for key length k.
+    """
+    freqs = np.zeros(max_len + 1, dtype=np.int64)
+    hist = np.zeros(length + 1, dtype=np.int64)
+    for groups in repeats.values():
+        hist += get_distance_histogram([idx for idx in groups if len(idx) <= SMALL_GROUP], length)
+        freqs += count_residue_pairs([idx for idx in groups if len(idx) > SMALL_GROUP], max_len)
+    for k in range(2, max_len + 1):
+        freqs[k] += hist[k::k].sum()
+    return freqs
+
+def count_residue_pairs(groups, max_len, block_size=2**22):
+    """Pairs within every group whose distance is divisible by k, for k in 2..max_len
+
+    All groups are counted at once by binning (group, position % k); the
+    groups are processed in blocks so the bins never exceed block_size.
+    """
+    freqs = np.zeros(max_len + 1, dtype=np.int64)
+    if not groups:
+        return freqs
+    sizes = [len(idx) for idx in groups]
+    pos = np.concatenate([np.array(idx, dtype=np.int32) for idx in groups])
+    group_ids = np.repeat(np.arange(len(groups), dtype=np.int32), sizes)
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+    for k in range(2, max_len + 1):
+        block = max(1, block_size // k)
+        for start in range(0, len(groups), block):
+            stop = min(start + block, len(groups))
+            sel = slice(offsets[start], offsets[stop])
+            c = np.bincount((group_ids[sel] - start) * k + pos[sel] % k)
+            freqs[k] += (np.dot(c, c) - c.sum()) // 2 # sum of c*(c-1)/2
+    return freqs
+
 def get_key_lens(max_len, doc):
-    factors = []
-    for n in range(2,max_len+1):
-        ngram = get_ngram(doc,n)
-        dists = get_ngram_distances(ngram)
-        _factors = [get_factors(i, limit=max_len) for i in dists]
-        # Flatten array: [[2,4], [6,3]] => [2,4,6,3]
-        factors += [item for sublist in _factors for item in sublist]
-
-    factor_frequencies = {k:factors.count(k) for k in range(2,max_len+1)}
+    repeats = get_repeated_ngrams(doc, max_len)
+    freqs = get_factor_frequencies(repeats, max_len, len(doc))
+    factor_frequencies = {k: int(freqs[k]) for k in range(2,max_len+1)}
     factor_frequencies = {k: v for k, v in sorted(factor_frequencies.items(), reverse=True, key=lambda item: item[1])}
     return factor_frequencies
 
+EN_IC = 0.0667 # Index of coincidence of English text
+RANDOM_IC = 1 / 26
+
+
+def encode(doc):
+    """Encode a document of letters as a uint8 array of alphabet indexes (A=0)
+
+    Lower case letters are upper-cased. Any other character raises a
+    ValueError, strip it first (e.g. kasiski_batch.clean).
+    """
+    if not doc.isascii():
+        raise ValueError('only the letters A-Z can be analysed, found non-ASCII text')
+    codes = np.frombuffer(doc.upper().encode('ascii'), dtype=np.uint8) - ord('A')
+    if (codes >= 26).any(): # Characters below 'A' wrap around to large values
+        bad = doc[int(np.argmax(codes >= 26))]
+        raise ValueError(f'only the letters A-Z can be analysed, found {bad!r}')
+    return codes
+
+def column_counts(codes, key_len):
+    """Letter histogram of every column, shape (key_len, 26)"""
+    cols = np.arange(len(codes)) % key_len
+    return np.bincount(cols * 26 + codes, minlength=key_len * 26).reshape(key_len, 26)
+
+def index_of_coincidence(counts):
+    """Index of coincidence of every row of a letter count matrix"""
+    n = counts.sum(axis=1)
+    pairs = n * (n - 1)
+    return np.divide((counts * (counts - 1)).sum(axis=1), pairs,
+                     out=np.zeros(len(counts)), where=pairs > 0)
+
+def get_key_lens_ic(max_len, doc):
+    """Rank key lengths by the mean index of coincidence of their columns
+
+    Columns enciphered with one key letter keep the IC of English (~0.067)
+    while mixed columns fall towards 1/26, so the right key length and its
+    multiples score highest.
+
+    Args:
+        max_len: Longest candidate key length.
+        doc: Ciphertext.
+
+    Returns:
+        A dict {key_len: mean IC} sorted like get_key_lens, best first.
+    """
+    codes = encode(doc)
+    res = {k: float(index_of_coincidence(column_counts(codes, k)).mean()) for k in range(2, max_len+1)}
+    return {k: v for k, v in sorted(res.items(), reverse=True, key=lambda item: item[1])}
+
+def friedman_key_len(doc):
+    """Friedman's estimate of the key length from the IC of the whole text"""
+    n = len(doc)
+    ic = index_of_coincidence(column_counts(encode(doc), 1))[0]
+    return (EN_IC - RANDOM_IC) * n / ((n - 1) * ic - RANDOM_IC * n + EN_IC)
+
 def frequency_analysis(doc, key_len):
     L = [''] * key_len 
     lf = [0] * key_len
@@ -96,9 +297,39 @@ def frequency_analysis(doc, key_len):
         lf[i] = [v.count(w)/len(v) if len(v) > 0 else 0 for w in ALPHABET ]
     return L, lf
 
+def chi_squared(counts):
+    """Chi-squared distance of every column to English for each of the 26 shifts
+
+    Args:
+        counts: Column letter histograms, shape (key_len, 26).
+
+    Returns:
+        An array of shape (key_len, 26) where [i, s] scores deciphering
+        column i with key letter ALPHABET[s], lower is more English.
+    """
+    en = get_letter_frequencies()
+    expected_shifted = en[(np.arange(26)[None, :] - np.arange(26)[:, None]) % 26] # [s, j] = EN_WF[j - s]
+    # sum (O - nW)^2 / nW expands to sum O^2 / nW - n, one matrix product for all shifts
+    n = counts.sum(axis=1)[:, None].astype(float)
+    squares = (counts.astype(float) ** 2) @ (1 / expected_shifted).T
+    return np.divide(squares, n, out=np.zeros_like(squares), where=n > 0) - n
+
+def rank_shifts(doc, key_len):
+    """Rank the key letters of every column by chi-squared against English
+
+    Returns:
+        (shifts, scores), both of shape (key_len, 26): shifts[i] holds the
+        alphabet indexes of column i's key letter candidates, best first,
+        and scores[i] their chi-squared values.
+        Ex. ALPHABET[shifts[i][0]] is the most probable key letter of column i.
+    """
+    scores = chi_squared(column_counts(encode(doc), key_len))
+    shifts = np.argsort(scores, axis=1, kind='stable')
+    return shifts, np.take_along_axis(scores, shifts, axis=1)
+
 def top_letters(k):
     #https://www.geeksforgeeks.org/python-indices-of-n-largest-elements-in-list/
-    lf = {w:v for w, v in zip(ALPHABET, EN_WF)} # e.g. A: 0.0012345
+    lf = {w:v for w, v in zip(ALPHABET, get_letter_frequencies())} # e.g. A: 0.0012345
     lf = {k: v for k, v in sorted(lf.items(), reverse=True, key=lambda item: item[1])}
     return list(lf.keys())[:k]
 
@@ -121,33 +352,335 @@ def candidate_keys(frequencies):
     key_comboes = list(itertools.product(*candidates))
     return [''.join(combo) for combo in key_comboes] # All key alternatives
 
+def best_keys(shifts, scores):
+    """Lazily yield keys in order of increasing total score (most probable first)
+
+    Best-first enumeration over the per-column rankings of rank_shifts.
+    Columns are ordered by the gap between their best and second best
+    letter, so each popped key has at most three successors that cost no
+    less: the next letter of the last changed column, a first step in the
+    following column, or that step moved over from the last column. Memory grows with the number of
+    keys taken, not with the 26^key_len key space.
+
+    Args:
+        shifts, scores: Per-column ranked shifts and scores, see rank_shifts.
+
+    Yields:
+        (key, score) tuples, e.g. ('BDLAEKCY', 256.3).
+    """
+    key_len = len(shifts)
+    if key_len == 0:
+        return
+    order = np.argsort(scores[:, 1] - scores[:, 0], kind='stable')
+    shifts, scores = shifts[order], scores[order].tolist()
+
+    def key(idx):
+        letters = [''] * key_len
+        for pos, i in enumerate(idx):
+            letters[order[pos]] = ALPHABET[shifts[pos, i]]
+        return ''.join(letters)
+
+    base = sum(col[0] for col in scores)
+    yield key([0] * key_len), base
+    first = [1] + [0] * (key_len - 1)
+    heap = [(base + scores[0][1] - scores[0][0], first, 0)]
+    while heap:
+        cost, idx, last = heapq.heappop(heap)
+        yield key(idx), cost
+        if idx[last] < 25:
+            nxt = idx.copy()
+            nxt[last] += 1
+            heapq.heappush(heap, (cost + scores[last][nxt[last]] - scores[last][idx[last]], nxt, last))
+        if last + 1 < key_len:
+            nxt = idx.copy()
+            nxt[last + 1] = 1
+            step = scores[last + 1][1] - scores[last + 1][0]
+            heapq.heappush(heap, (cost + step, nxt, last + 1))
+            if idx[last] == 1:
+                moved = nxt.copy()
+                moved[last] = 0
+                heapq.heappush(heap, (cost + step - scores[last][1] + scores[last][0], moved, last + 1))
+
+# Translation tables enciphering and deciphering a column with each key letter
+ENCIPHER_TABLES = {letter: bytes.maketrans(ALPHABET.encode(), (ALPHABET[i:] + ALPHABET[:i]).encode())
+                   for i, letter in enumerate(ALPHABET)}
+DECIPHER_TABLES = {letter: bytes.maketrans(ALPHABET.encode(), (ALPHABET[-i:] + ALPHABET[:-i]).encode())
+                   for i, letter in enumerate(ALPHABET)}
+
+
+def trie_regex(words):
+    """Regex matching any of words at a position, with common prefixes factored out
+
+    Ex. ['AND', 'ANY', 'ARE'] => 'A(?:N(?:D|Y)|RE)'
+    A word that is a prefix of others ends its branch, since only whether
+    some word starts at a position matters.
+    """
+    trie = {}
+    for w in words:
+        node = trie
+        for char in w:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node):
+        if '' in node:
+            return ''
+        alts = [re.escape(char) + build(child) for char, child in sorted(node.items())]
+        return alts[0] if len(alts) == 1 else '(?:' + '|'.join(alts) + ')'
+    return build(trie)
+
+@functools.lru_cache(maxsize=None)
+def stopword_pattern():
+    """All stopwords compiled into one regex matching at every position a stopword starts"""
+    words = [w for w in get_stopwords() if w.isalpha()]
+    return re.compile(('(?=' + trie_regex(words) + ')').encode())
+
+def stopword_count(text):
+    """Number of positions in text (str or bytes) where a stopword starts, in one scan"""
+    if isinstance(text, str):
+        text = text.encode('ascii')
+    return len(stopword_pattern().findall(text))
+
+
+class ColumnDecoder:
+    """Deciphers one document under many keys of the same length
+
+    Each (column, key letter) is deciphered once and cached, and only the
+    columns whose letter differs from the previous key are written into the
+    output buffer. Keys from best_keys mostly differ in a column or two.
+    """
+    def __init__(self, doc, key_len):
+        self.doc = doc.encode('ascii')
+        self.key_len = key_len
+        self.columns = {} # (column, key letter) -> deciphered column
+        self.buf = bytearray(self.doc)
+        self.key = [None] * key_len
+
+    def decipher(self, key):
+        """Deciphered document as a bytearray, valid until the next call"""
+        for i, letter in enumerate(key):
+            if self.key[i] == letter:
+                continue
+            col = self.columns.get((i, letter))
+            if col is None:
+                col = self.columns[(i, letter)] = self.doc[i::self.key_len].translate(DECIPHER_TABLES[letter])
+            self.buf[i::self.key_len] = col
+            self.key[i] = letter
+        return self.buf
+
+
 def get_top_candidates(doc, keys, k=5):
-    res = {k:0 for k in keys}
+    """Rank keys by the number of stopwords in the deciphered document
+
+    Args:
+        doc: Ciphertext.
+        keys: Iterable of candidate keys, e.g. from best_keys.
+        k: Number of keys to return.
+
+    Returns:
+        The top k keys and their stopword counts, best first.
+    """
+    decoders = {}
+    res = {}
     for key in keys:
-        decoded_doc = decipher(doc, key)
-        res[key] = sum([decoded_doc.count(word) for word in STOPWORDS])
-    
+        decoder = decoders.get(len(key))
+        if decoder is None:
+            decoder = decoders[len(key)] = ColumnDecoder(doc, len(key))
+        res[key] = stopword_count(decoder.decipher(key))
+
     res = {k: v for k, v in sorted(res.items(), reverse=True, key=lambda item: item[1])}
     return list(res.keys())[:k], list(res.values())[:k]  # Top k key alternatives
 
+def shift_text(doc, key, tables):
+    """Translates every column of doc with the table of its key letter
+
+    Text and key are upper-cased. Other ASCII characters than letters are
+    kept as they are but still take their place in the key period.
+    """
+    key = key.upper()
+    if not key or not (key.isascii() and key.isalpha()):
+        raise ValueError(f'key must be a non-empty string of letters A-Z, got {key!r}')
+    if not doc.isascii():
+        raise ValueError('text must be ASCII, non-ASCII characters cannot be enciphered')
+    doc = doc.upper().encode('ascii')
+    out = bytearray(len(doc))
+    for i, letter in enumerate(key[:len(doc)]):
+        out[i::len(key)] = doc[i::len(key)].translate(tables[letter])
+    return out.decode('ascii')
+
 def decipher(doc, key):
-    key_len = len(key)
-    key = ''.join([key[i % key_len] for i in range(len(doc))])
-    decoded_doc = []
-    for i, char in enumerate(doc):
-        shift = (ALPHABET.find(char) - ALPHABET.find(key[i])) % 26
-        decoded_doc.append(ALPHABET[shift])
-    return ''.join(decoded_doc)
+    return shift_text(doc, key, DECIPHER_TABLES)
 
 def encipher(doc, key):
-    key_len = len(key)
-    key = ''.join([key[i % key_len] for i in range(len(doc))])
-    decoded_doc = []
-    for i, char in enumerate(doc):
-        shift = (ALPHABET.find(char) + ALPHABET.find(key[i])) % 26
-        decoded_doc.append(ALPHABET[shift])
-    decoded_doc = ''.join(decoded_doc)
-    return ''.join(decoded_doc)
+    return shift_text(doc, key, ENCIPHER_TABLES)
+
+def vigenere_chunks(chunks, key, decrypt=True):
+    """Decipher (or encipher) an iterable of text chunks as one continuous text
+
+    Whitespace is dropped and the key phase carries over chunk boundaries,
+    so the output equals deciphering the joined chunks at once.
+    """
+    phase = 0
+    for chunk in chunks:
+        chunk = ''.join(chunk.split())
+        rotated = key[phase:] + key[:phase]
+        yield decipher(chunk, rotated) if decrypt else encipher(chunk, rotated)
+        phase = (phase + len(chunk)) % len(key)
+
+def vigenere_file(src, dst, key, decrypt=True, chunk_size=CHUNK_SIZE):
+    """Streams the file src deciphered (or enciphered) with key into dst, chunk_size characters at a time"""
+    with open(src) as fin, open(dst, 'w') as fout:
+        for text in vigenere_chunks(iter(lambda: fin.read(chunk_size), ''), key, decrypt):
+            fout.write(text)
+
+
+QUADGRAM_FLOOR = 0.01 # Pseudo count of quadgrams missing from the corpus
+QUADGRAM_WEIGHTS = np.array([26**3, 26**2, 26, 1])
+MAX_ROUNDS = 50
+
+
+def count_quadgrams(path=CORPUS_FILE):
+    """Counts of all 26^4 letter quadgrams of a text file, indexed by their base 26 value"""
+    with open(path) as f:
+        codes = encode(re.sub('[^A-Z]', '', f.read().upper())).astype(np.int64)
+    idx = np.lib.stride_tricks.sliding_window_view(codes, 4) @ QUADGRAM_WEIGHTS
+    return np.bincount(idx, minlength=26**4)
+
+def save_quadgrams(path=QUADGRAM_FILE, corpus=CORPUS_FILE):
+    """Precompiles the quadgram counts of corpus into the sparse file path"""
+    counts = count_quadgrams(corpus)
+    idx = np.flatnonzero(counts)
+    np.savez_compressed(path, idx=idx.astype(np.uint32), counts=counts[idx].astype(np.uint32))
+
+@functools.lru_cache(maxsize=None)
+def get_quadgrams(path=QUADGRAM_FILE):
+    """Log probabilities of all 26^4 letter quadgrams, indexed by their base 26 value
+
+    Read from the precompiled counts of QUADGRAM_FILE (see save_quadgrams),
+    or counted from path when that is a plain text corpus.
+    """
+    if path.endswith('.npz'):
+        with np.load(path) as f:
+            counts = np.zeros(26**4)
+            counts[f['idx']] = f['counts']
+    else:
+        counts = count_quadgrams(path).astype(float)
+    counts += QUADGRAM_FLOOR
+    return np.log(counts / counts.sum())
+
+def fitness(doc):
+    """Sum of the quadgram log probabilities of doc, higher is more English"""
+    codes = encode(doc).astype(np.int64)
+    if len(codes) < 4:
+        return 0.0
+    return float(get_quadgrams()[np.lib.stride_tricks.sliding_window_view(codes, 4) @ QUADGRAM_WEIGHTS].sum())
+
+def best_column_letter(codes, plain, key_len, col):
+    """Shift of column col maximizing the fitness, plain being the current decoding
+
+    Only the quadgrams overlapping the column change, so those are scored
+    for all 26 shifts at once.
+    """
+    n = len(codes)
+    starts = np.arange(col, n, key_len)
+    starts = np.unique((starts[:, None] - np.arange(4)).ravel())
+    starts = starts[(starts >= 0) & (starts <= n - 4)]
+    pos = starts[:, None] + np.arange(4)
+    in_col = pos % key_len == col
+    shifted = (codes[pos][None] - np.arange(26)[:, None, None]) % 26 # [shift, quadgram, letter]
+    grams = np.where(in_col[None], shifted, plain[pos][None])
+    return int(np.argmax(get_quadgrams()[grams @ QUADGRAM_WEIGHTS].sum(axis=1)))
+
+def hill_climb(doc, key, max_rounds=MAX_ROUNDS):
+    """Refine key one column at a time until no letter change raises the fitness
+
+    Args:
+        doc: Ciphertext.
+        key: Starting key, e.g. the best one of rank_shifts.
+        max_rounds: Upper bound of passes over all columns.
+
+    Returns:
+        (key, fitness) of the local optimum.
+    """
+    codes = encode(doc).astype(np.int64)
+    shifts = encode(key).astype(np.int64)
+    key_len = len(shifts)
+    if len(codes) < 4:
+        return key, fitness(decipher(doc, key))
+    plain = (codes - np.resize(shifts, len(codes))) % 26
+    for _ in range(max_rounds):
+        changed = False
+        for col in range(key_len):
+            best = best_column_letter(codes, plain, key_len, col)
+            if best != shifts[col]:
+                shifts[col] = best
+                plain[col::key_len] = (codes[col::key_len] - best) % 26
+                changed = True
+        if not changed:
+            break
+    key = ''.join(ALPHABET[s] for s in shifts)
+    return key, fitness(decipher(doc, key))
+
+def solve(doc, key_len):
+    """Key of length key_len found by hill climbing from the chi-squared best letters"""
+    shifts, _ = rank_shifts(doc, key_len)
+    return hill_climb(doc, ''.join(ALPHABET[s] for s in shifts[:, 0]))
+
+
+_worker_doc = None
+
+
+def _init_worker(doc):
+    global _worker_doc
+    _worker_doc = doc
+
+def ngram_ranges(max_len, tasks):
+    """Splits the ngram lengths 2..max_len into at most tasks (min_len, max_len) ranges"""
+    size = max(1, -(-(max_len - 1) // tasks))
+    return [(n, min(n + size - 1, max_len)) for n in range(2, max_len + 1, size)]
+
+def _factor_frequencies_range(args):
+    min_len, max_ngram, max_len = args
+    repeats = get_repeated_ngrams(_worker_doc, max_ngram, min_len=min_len)
+    return get_factor_frequencies(repeats, max_len, len(_worker_doc))
+
+def get_key_lens_parallel(max_len, doc, processes=None, tasks_per_process=4):
+    """get_key_lens with the ngram lengths split over a process pool
+
+    Every task finds the repeats of its own range of ngram lengths from
+    scratch and returns its factor frequencies, which are summed in task
+    order. The document reaches each worker once through the pool
+    initializer. Shorter ngrams repeat far more often, so the lengths are
+    cut into several ranges per process to balance the load.
+    """
+    processes = processes or os.cpu_count()
+    tasks = [(a, b, max_len) for a, b in ngram_ranges(max_len, processes * tasks_per_process)]
+    with Pool(processes, initializer=_init_worker, initargs=(doc,)) as pool:
+        freqs = sum(pool.map(_factor_frequencies_range, tasks), np.zeros(max_len + 1, dtype=np.int64))
+    factor_frequencies = {k: int(freqs[k]) for k in range(2, max_len+1)}
+    return {k: v for k, v in sorted(factor_frequencies.items(), reverse=True, key=lambda item: item[1])}
+
+def _top_candidates(args):
+    key_len, n_keys, k = args
+    keys = (key for key, _ in itertools.islice(best_keys(*rank_shifts(_worker_doc, key_len)), n_keys))
+    return get_top_candidates(_worker_doc, keys, k=k)
+
+def get_top_candidates_parallel(doc, key_lens, k=5, n_keys=MAX_CANDIDATES, processes=None):
+    """Top k keys of every candidate key length, one key length per pool task
+
+    Args:
+        doc: Ciphertext.
+        key_lens: Candidate key lengths, e.g. the first few of get_key_lens.
+        k: Keys to return per key length.
+        n_keys: Most probable keys (best_keys) compared per key length.
+
+    Returns:
+        A dict {key_len: (keys, stopword counts)} in the order of key_lens.
+    """
+    key_lens = list(key_lens)
+    with Pool(processes, initializer=_init_worker, initargs=(doc,)) as pool:
+        res = pool.map(_top_candidates, [(key_len, n_keys, k) for key_len in key_lens])
+    return dict(zip(key_lens, res))
 
 
 if __name__ == "__main__":
@@ -169,7 +702,7 @@ if __name__ == "__main__":
 
     start_time = time.time()
     L, lf = frequency_analysis(doc, key_len)
-    keys = candidate_keys(lf)
+    keys = [key for key, _ in itertools.islice(best_keys(*rank_shifts(doc, key_len)), MAX_CANDIDATES)]
     time_candidate_keys = (time.time() - start_time) #time for freq analysis + candidate keys
 
     print(f'\nOriginal document divided into {key_len} columns:\n{L}\n\n')
@@ -184,6 +717,9 @@ if __name__ == "__main__":
         decoded_doc = decipher(doc, key)
         print(f'\nKey: {key}:\nStopword count: {count}\nDecoded text:\n{decoded_doc}')
     
+    key, score = solve(doc, key_len)
+    print(f'\nHill climbing key: {key} (quadgram fitness {score:.1f})')
+
     key = input("Final key (Type n to ignore):")
     if key != "n":
         deciphered_doc = decipher(doc, key)
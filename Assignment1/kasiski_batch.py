@@ -0,0 +1,159 @@
+import os
+import re
+import sys
+import json
+import time
+import argparse
+from multiprocessing import Pool
+from kasiski import get_key_lens, get_key_lens_ic, solve, decipher, stopword_count
+
+MAX_KEY_LEN = 20
+MIN_COLUMN_LEN = 10 # Letters per column needed for a meaningful index of coincidence
+KEY_LEN_TOLERANCE = 0.9 # Key lengths within this fraction of the best IC count as candidates
+KASISKI_TOP = 3
+
+
+def clean(text):
+    """Uppercase letters of text, the form kasiski.py works on"""
+    return re.sub('[^A-Z]', '', text.upper())
+
+def choose_key_len(doc, max_len=MAX_KEY_LEN):
+    """Most probable key length of doc by index of coincidence
+
+    Multiples of the key length score about as high as the key length
+    itself, so the shortest length close to the best IC is taken.
+    """
+    max_len = min(max_len, len(doc) // MIN_COLUMN_LEN)
+    key_lens = get_key_lens_ic(max_len, doc)
+    if not key_lens:
+        return 1
+    best = max(key_lens.values())
+    return min(k for k, ic in key_lens.items() if ic >= best * KEY_LEN_TOLERANCE)
+
+def shortest_period(key):
+    """Shortest key that repeats to key, e.g. QQ => Q, ABAB => AB"""
+    for p in range(1, len(key)):
+        if len(key) % p == 0 and key == key[:p] * (len(key) // p):
+            return key[:p]
+    return key
+
+def crack(doc_id, text, max_len=MAX_KEY_LEN, kasiski=False, plaintext=False):
+    """Cracks one ciphertext, returns its JSON serializable result"""
+    timings = {}
+    doc = clean(text)
+    res = {'id': doc_id, 'length': len(doc)}
+
+    start_time = time.time()
+    res['key_len'] = choose_key_len(doc, max_len)
+    timings['key_len'] = time.time() - start_time
+
+    if kasiski:
+        start_time = time.time()
+        res['kasiski'] = list(get_key_lens(max_len, doc))[:KASISKI_TOP]
+        timings['kasiski'] = time.time() - start_time
+
+    start_time = time.time()
+    key, fitness = solve(doc, res['key_len'])
+    timings['solve'] = time.time() - start_time
+
+    start_time = time.time()
+    decoded_doc = decipher(doc, key)
+    res['stopwords'] = stopword_count(decoded_doc)
+    timings['score'] = time.time() - start_time
+
+    res['key'] = shortest_period(key)
+    res['fitness'] = fitness / max(len(doc) - 3, 1) # Per quadgram, comparable across documents
+    if plaintext:
+        res['plaintext'] = decoded_doc
+    res['timings'] = timings
+    return res
+
+def _crack_task(args):
+    doc_id, text, options = args
+    try:
+        if isinstance(text, Exception): # The reader could not parse this document
+            raise text
+        return crack(doc_id, text, **options)
+    except Exception as e:
+        return {'id': doc_id, 'error': f'{type(e).__name__}: {e}'}
+
+
+def read_directory(path):
+    """Yields (file name, text) of every file in the directory path, sorted by name
+
+    A file that cannot be read yields its exception as the text, which
+    becomes that document's error record.
+    """
+    for name in sorted(os.listdir(path)):
+        file_path = os.path.join(path, name)
+        if os.path.isfile(file_path):
+            try:
+                with open(file_path) as f:
+                    yield name, f.read()
+            except (OSError, UnicodeDecodeError) as e:
+                yield name, e
+
+def parse_line(line):
+    """Ciphertext of one {"id": ..., "ciphertext": ...} line (str or bytes) and its id, or None"""
+    if isinstance(line, bytes):
+        line = line.decode('utf-8')
+    item = json.loads(line)
+    if not isinstance(item, dict):
+        raise ValueError('line is not a JSON object')
+    if not isinstance(item.get('ciphertext'), str):
+        raise KeyError('ciphertext must be a string')
+    return item.get('id'), item['ciphertext']
+
+def read_jsonl(f):
+    """Yields (id, ciphertext) of every {"id": ..., "ciphertext": ...} line of f
+
+    The id defaults to the line number. A line that cannot be parsed yields
+    its exception as the ciphertext, which becomes that line's error record.
+    """
+    for i, line in enumerate(f):
+        if line.strip():
+            try:
+                doc_id, text = parse_line(line)
+            except (ValueError, KeyError) as e: # JSONDecodeError and UnicodeDecodeError are ValueErrors
+                yield i, e
+                continue
+            yield i if doc_id is None else doc_id, text
+
+def crack_all(docs, processes=None, chunksize=4, **options):
+    """Lazily yields the crack results of (id, text) pairs, in input order
+
+    The documents are cracked on a process pool and each result is yielded
+    as soon as it and all earlier ones are done.
+    """
+    tasks = ((doc_id, text, options) for doc_id, text in docs)
+    with Pool(processes) as pool:
+        yield from pool.imap(_crack_task, tasks, chunksize=chunksize)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Crack a batch of Vigenere ciphertexts, writing JSON lines')
+    parser.add_argument('input', help='Directory of ciphertext files, JSONL file, or - for JSONL on stdin')
+    parser.add_argument('-o', '--output', help='Write the JSON lines here instead of stdout')
+    parser.add_argument('--max-key-len', type=int, default=MAX_KEY_LEN)
+    parser.add_argument('--processes', type=int, help='Worker processes, defaults to the cpu count')
+    parser.add_argument('--kasiski', action='store_true', help='Also report the top Kasiski key lengths')
+    parser.add_argument('--plaintext', action='store_true', help='Include the deciphered text')
+    args = parser.parse_args()
+
+    if args.input == '-':
+        docs = read_jsonl(sys.stdin.buffer)
+    elif os.path.isdir(args.input):
+        docs = read_directory(args.input)
+    else:
+        docs = read_jsonl(open(args.input, 'rb'))
+
+    out = open(args.output, 'w') if args.output else sys.stdout
+    start_time = time.time()
+    n = 0
+    for res in crack_all(docs, args.processes, max_len=args.max_key_len, kasiski=args.kasiski,
+                         plaintext=args.plaintext):
+        out.write(json.dumps(res) + '\n')
+        out.flush()
+        n += 1
+    elapsed = time.time() - start_time
+    print(f'{n} documents in {elapsed:.2f}s ({n / elapsed:.1f} docs/s)', file=sys.stderr)
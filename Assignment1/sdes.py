@@ -1,7 +1,12 @@
 import os
+import mmap
 import binascii
 import time
 import multiprocessing
+import functools
+import heapq
+import collections
+import numpy as np
 from multiprocessing import Pool
 
 # Fast indexing for S-boxes
@@ -192,6 +197,537 @@ def test_decrypt_3DES():
     return plaintexts
 
 
+# Integer/table-driven engine. Blocks are ints in 0-255 and keys ints in
+# 0-1023 (MSB first, i.e. bits_to_val(K)), so every result is bit-for-bit
+# equal to the list based reference functions above.
+P10_ORDER = [3,5,2,7,4,10,1,9,8,6]
+P8_ORDER = [6,3,7,4,8,5,10,9]
+P4_ORDER = [2,4,3,1]
+IP_ORDER = [2,6,3,1,4,8,5,7]
+EP_ORDER = [4,1,2,3,2,3,4,1]
+IP_INV_ORDER = [4,1,3,5,7,2,8,6]
+
+
+def permute_int(val, order, n):
+    """Permutes the n bit integer val by a 1-indexed table (MSB first)"""
+    out = 0
+    for i in order:
+        out = (out << 1) | ((val >> (n-i)) & 1)
+    return out
+
+def rotate_int(val, k, n=5):
+    """Performs a left rotation by k on an n bit integer"""
+    return ((val << k) | (val >> (n-k))) & ((1 << n) - 1)
+
+def generate_key_int(K):
+    K = permute_int(K, P10_ORDER, 10)
+    LS_1_0 = rotate_int(K >> 5, k=1)
+    LS_1_1 = rotate_int(K & 0x1f, k=1)
+    K1 = permute_int((LS_1_0 << 5) | LS_1_1, P8_ORDER, 10)
+    LS_2_0 = rotate_int(LS_1_0, k=2)
+    LS_2_1 = rotate_int(LS_1_1, k=2)
+    K2 = permute_int((LS_2_0 << 5) | LS_2_1, P8_ORDER, 10)
+    return K1,K2
+
+def S_box_int(box, nibble):
+    r = ((nibble >> 2) & 2) | (nibble & 1) #bit_1, bit_4
+    c = (nibble >> 1) & 3 #bit_2, bit_3
+    return bits_to_val(box[r][c])
+
+
+EP_TABLE = [permute_int(nibble, EP_ORDER, 4) for nibble in range(16)]
+# S-boxes followed by P4 for every 8 bit input
+SP_TABLE = [permute_int((S_box_int(S0, x >> 4) << 2) | S_box_int(S1, x & 0xf), P4_ORDER, 4) for x in range(256)]
+
+
+def round_table(K):
+    """Precomputes sdes_round for every input byte under subkey K"""
+    F = [SP_TABLE[EP_TABLE[nibble] ^ K] for nibble in range(16)]
+    return [(((b >> 4) ^ F[b & 0xf]) << 4) | (b & 0xf) for b in range(256)]
+
+
+IP_TABLE = [permute_int(b, IP_ORDER, 8) for b in range(256)]
+IP_INV_TABLE = [permute_int(b, IP_INV_ORDER, 8) for b in range(256)]
+SW_TABLE = [((b << 4) | (b >> 4)) & 0xff for b in range(256)]
+SUBKEYS = [generate_key_int(K) for K in range(2**10)]
+ROUND_TABLES = [round_table(K) for K in range(2**8)]
+
+
+def encrypt_int(K, plaintext):
+    K1,K2 = SUBKEYS[K]
+    round_1 = ROUND_TABLES[K1][IP_TABLE[plaintext]]
+    round_2 = ROUND_TABLES[K2][SW_TABLE[round_1]]
+    return IP_INV_TABLE[round_2]
+
+def decrypt_int(K, ciphertext):
+    K1,K2 = SUBKEYS[K]
+    round_1 = ROUND_TABLES[K2][IP_TABLE[ciphertext]]
+    round_2 = ROUND_TABLES[K1][SW_TABLE[round_1]]
+    return IP_INV_TABLE[round_2]
+
+def encrypt_3DES_int(K1, K2, plaintext):
+    return encrypt_int(K1,decrypt_int(K2,encrypt_int(K1,plaintext)))
+
+def decrypt_3DES_int(K, ciphertext):
+    """K is the 20 bit key K1+K2, i.e. K1 in the 10 high bits"""
+    K1,K2 = K >> 10, K & 0x3ff
+    return decrypt_int(K1, encrypt_int(K2, decrypt_int(K1, ciphertext)))
+
+
+def encrypt_table(K):
+    """Ciphertext byte for every plaintext byte, usable with bytes.translate"""
+    return bytes(encrypt_int(K, b) for b in range(256))
+
+def decrypt_table(K):
+    return bytes(decrypt_int(K, b) for b in range(256))
+
+def encrypt_bytes(K, data):
+    return bytes(data).translate(encrypt_table(K))
+
+def decrypt_bytes(K, data):
+    return bytes(data).translate(decrypt_table(K))
+
+def encrypt_3DES_bytes(K1, K2, data):
+    table = bytes(encrypt_3DES_int(K1, K2, b) for b in range(256))
+    return bytes(data).translate(table)
+
+def decrypt_3DES_bytes(K, data):
+    table = bytes(decrypt_3DES_int(K, b) for b in range(256))
+    return bytes(data).translate(table)
+
+
+def bits_to_bytes(bits):
+    """Packs a flat list of 0/1 ints (e.g. a parsed CTX file) into bytes"""
+    return bytes(bits_to_val(c) for c in chunk(bits, n=8))
+
+def bytes_to_bits(data):
+    return [b for byte in data for b in val_to_bits(byte, return_len=8)]
+
+
+# Full codebook: encrypt and decrypt tables for all 1024 keys stored back to
+# back (256 bytes per key), i.e. 256 KB per direction.
+CODEBOOK_SIZE = 2**10 * 256
+_codebook = None
+
+
+def build_codebook():
+    enc = bytearray(CODEBOOK_SIZE)
+    dec = bytearray(CODEBOOK_SIZE)
+    for K in range(2**10):
+        offset = K * 256
+        table = encrypt_table(K)
+        enc[offset:offset+256] = table
+        for p, c in enumerate(table):
+            dec[offset + c] = p
+    return bytes(enc), bytes(dec)
+
+def load_codebook(path=None):
+    """Loads the codebook used by the codebook_* lookups
+
+    Args:
+        path: Optional file to persist the codebook in. It is written on
+            first use and memory-mapped on every later load.
+
+    Returns:
+        Tuple (enc, dec) of 256 KB tables, the table of key K being
+        enc[K*256:(K+1)*256].
+    """
+    global _codebook
+    if path is None:
+        _codebook = build_codebook()
+        return _codebook
+    if not os.path.exists(path):
+        enc, dec = build_codebook()
+        with open(path, 'wb') as f:
+            f.write(enc + dec)
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(mm) != 2 * CODEBOOK_SIZE:
+        raise ValueError(f'{path} is not a S-DES codebook ({len(mm)} bytes)')
+    view = memoryview(mm)
+    _codebook = view[:CODEBOOK_SIZE], view[CODEBOOK_SIZE:]
+    return _codebook
+
+def get_codebook():
+    if _codebook is None:
+        return load_codebook()
+    return _codebook
+
+
+def codebook_tables(K):
+    """Encrypt and decrypt table of a single key"""
+    enc, dec = get_codebook()
+    return enc[K*256:(K+1)*256], dec[K*256:(K+1)*256]
+
+def codebook_encrypt(K, data):
+    return bytes(data).translate(codebook_tables(K)[0])
+
+def codebook_decrypt(K, data):
+    return bytes(data).translate(codebook_tables(K)[1])
+
+def codebook_3DES_tables(K):
+    """Composes the TripleSDES tables of the 20 bit key K (K1 in the high bits)"""
+    E1, D1 = codebook_tables(K >> 10)
+    E2, D2 = codebook_tables(K & 0x3ff)
+    enc = bytes(E1).translate(D2).translate(E1)
+    dec = bytes(D1).translate(E2).translate(D1)
+    return enc, dec
+
+def codebook_encrypt_3DES(K1, K2, data):
+    return bytes(data).translate(codebook_3DES_tables((K1 << 10) | K2)[0])
+
+def codebook_decrypt_3DES(K, data):
+    return bytes(data).translate(codebook_3DES_tables(K)[1])
+
+def codebook_key_check(K, data):
+    """Same as key_check, but K is an int and data the ciphertext bytes"""
+    dec = codebook_decrypt(K, data)
+    if dec.isalpha():
+        return dec.decode()
+    return False
+
+def codebook_key_check_3des(K, data):
+    dec = codebook_decrypt_3DES(K, data)
+    if dec.isalpha():
+        return K, dec.decode()
+    return K, False
+
+
+# Vectorized cracking over the whole key space
+def is_letter(arr):
+    """Boolean mask of the ASCII letters (A-Z, a-z) in a uint8 array"""
+    return ((arr > 64) & (arr < 91)) | ((arr > 96) & (arr < 123))
+
+def codebook_arrays():
+    """The codebook as two (1024, 256) uint8 arrays, row K being the table of key K"""
+    return tuple(np.frombuffer(bytes(t), dtype=np.uint8).reshape(2**10, 256) for t in get_codebook())
+
+def decrypt_all_keys(data):
+    """Decrypts data under every S-DES key, row K holds the plaintext of key K"""
+    return codebook_arrays()[1][:, np.frombuffer(bytes(data), dtype=np.uint8)]
+
+def crack_sdes(data):
+    """Finds every key whose plaintext of data is letters only
+
+    Args:
+        data: Ciphertext bytes (see bits_to_bytes).
+
+    Returns:
+        List of (key, plaintext) tuples, key as an int (see val_to_bits).
+        Empty data matches no key, as in key_check.
+    """
+    if not len(data):
+        return []
+    dec = decrypt_all_keys(data)
+    keys = np.flatnonzero(is_letter(dec).all(axis=1))
+    return [(int(K), dec[K].tobytes().decode()) for K in keys]
+
+def crack_sdes_batch(ciphertexts):
+    """Runs crack_sdes over many ciphertexts in one gather per length"""
+    results = [None] * len(ciphertexts)
+    _, dec = codebook_arrays()
+    by_len = {}
+    for i, data in enumerate(ciphertexts):
+        by_len.setdefault(len(data), []).append(i)
+    for i in by_len.pop(0, []):
+        results[i] = []
+    for idx in by_len.values():
+        batch = np.frombuffer(b''.join(bytes(ciphertexts[i]) for i in idx), dtype=np.uint8)
+        plain = dec[:, batch.reshape(len(idx), -1)] # keys x messages x bytes
+        ok = is_letter(plain).all(axis=2)
+        for j, i in enumerate(idx):
+            results[i] = [(int(K), plain[K, j].tobytes().decode()) for K in np.flatnonzero(ok[:, j])]
+    return results
+
+
+# Plaintext scoring. A scorer holds per-byte log scores and optionally a
+# 256x256 table of bigram log scores. -inf rejects a byte outright, so the
+# letters scorer is the test done by key_check, and since no score is
+# positive a running sum can only fall, which allows an early abort.
+Scorer = collections.namedtuple('Scorer', ['unigram', 'bigram'])
+CORPUS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'english_corpus.txt')
+PRINTABLE = [9, 10, 13] + list(range(32, 127))
+
+
+def byte_table(allowed, scores=None):
+    """256 entry score table, -inf outside allowed"""
+    table = np.full(256, -np.inf)
+    table[allowed] = 0.0 if scores is None else scores
+    return table
+
+def corpus_counts(path=CORPUS_FILE):
+    with open(path, 'rb') as f:
+        corpus = np.frombuffer(f.read(), dtype=np.uint8)
+    unigram = np.bincount(corpus, minlength=256).astype(float)
+    bigram = np.bincount(corpus[:-1].astype(np.int64) * 256 + corpus[1:], minlength=256*256)
+    return unigram, bigram.reshape(256, 256).astype(float)
+
+@functools.lru_cache(maxsize=None)
+def get_scorer(name):
+    """Returns a Scorer: 'letters', 'printable', 'unigram' or 'bigram'
+
+    The English unigram and bigram log-likelihoods are estimated from
+    data/english_corpus.txt with add-one smoothing over printable bytes.
+    """
+    letters = list(range(65, 91)) + list(range(97, 123))
+    if name == 'letters':
+        return Scorer(byte_table(letters), None)
+    if name == 'printable':
+        return Scorer(byte_table(PRINTABLE), None)
+    unigram, bigram = corpus_counts()
+    p = unigram[PRINTABLE] + 1
+    unigram_table = byte_table(PRINTABLE, np.log(p / p.sum()))
+    if name == 'unigram':
+        return Scorer(unigram_table, None)
+    if name == 'bigram':
+        pairs = bigram[np.ix_(PRINTABLE, PRINTABLE)] + 1
+        bigram_table = np.full((256, 256), -np.inf)
+        bigram_table[np.ix_(PRINTABLE, PRINTABLE)] = np.log(pairs / pairs.sum(axis=1, keepdims=True))
+        return Scorer(byte_table(PRINTABLE), bigram_table)
+    raise ValueError(f'Unknown scorer {name}')
+
+def score_plaintext(plain, scorer='letters', bound=-np.inf):
+    """Scores a plaintext byte by byte, aborting once the score drops to bound
+
+    Returns:
+        The score, or None if the plaintext was rejected or fell to bound.
+    """
+    unigram, bigram = get_scorer(scorer)
+    total = 0.0
+    prev = None
+    for b in bytes(plain):
+        total += unigram[b]
+        if bigram is not None and prev is not None:
+            total += bigram[prev, b]
+        if total <= bound:
+            return None
+        prev = b
+    return total
+
+def score_rows(dec, scorer='letters'):
+    """Scores every row of a (keys, bytes) plaintext array at once"""
+    unigram, bigram = get_scorer(scorer)
+    scores = unigram[dec].sum(axis=1)
+    if bigram is not None and dec.shape[1] > 1:
+        scores += bigram[dec[:, :-1], dec[:, 1:]].sum(axis=1)
+    return scores
+
+def top_keys(keys, scores, dec, top):
+    """Ranks (key, score, plaintext) by score, dropping rejected keys"""
+    order = np.argsort(-scores, kind='stable')[:top]
+    return [(int(keys[i]), float(scores[i]), dec[i].tobytes().decode('latin-1'))
+            for i in order if np.isfinite(scores[i])]
+
+def rank_keys(data, scorer='letters', top=10):
+    """Top S-DES keys for data by plaintext score, as (key, score, plaintext)"""
+    dec = decrypt_all_keys(data)
+    return top_keys(np.arange(2**10), score_rows(dec, scorer), dec, top)
+
+def rank_keys_3des(data, scorer='letters', top=10):
+    """Top TripleSDES keys for data, scoring all 1024 K2 per K1 as one array"""
+    enc, dec = codebook_arrays()
+    data = np.frombuffer(bytes(data), dtype=np.uint8)
+    K2 = np.arange(2**10)
+    best = [] # heap of (score, key, plaintext)
+    for K1 in range(2**10):
+        plain = dec[K1][enc[:, dec[K1][data]]] # D_K1(E_K2(D_K1(c))) for every K2
+        for K, score, text in top_keys((K1 << 10) | K2, score_rows(plain, scorer), plain, top):
+            if len(best) < top:
+                heapq.heappush(best, (score, -K, text))
+            elif score > best[0][0]:
+                heapq.heapreplace(best, (score, -K, text))
+    return [(-K, score, text) for score, K, text in sorted(best, reverse=True)]
+
+
+# Known-plaintext key index. index[p][c] is the bitset (an int, bit K set)
+# of the S-DES keys K encrypting byte p to byte c, so the keys matching a
+# set of observed pairs are the intersection of one bitset per pair.
+#
+# Meet-in-the-middle for TripleSDES. decrypt_3DES is D_K1(E_K2(D_K1(c))), so a
+# known (p, c) pair requires E_K2(D_K1(c)) == E_K1(p). For each of the 1024
+# values of K1 the pairs (D_K1(c), E_K1(p)) are looked up in the same index,
+# which leaves a second stage of one lookup per known pair to find K2.
+_pair_index = None
+ALL_KEYS = (1 << 2**10) - 1
+
+
+def get_pair_index():
+    """index[x][y] is the bitset of the keys K with encrypt_int(K, x) == y"""
+    global _pair_index
+    if _pair_index is None:
+        enc, _ = get_codebook()
+        index = [[0] * 256 for _ in range(256)]
+        for K in range(2**10):
+            bit = 1 << K
+            for x, y in enumerate(enc[K*256:(K+1)*256]):
+                index[x][y] |= bit
+        _pair_index = index
+    return _pair_index
+
+def bitset_keys(bits):
+    """Lists the keys set in a key bitset in increasing order"""
+    keys = []
+    while bits:
+        low = bits & -bits
+        keys.append(low.bit_length() - 1)
+        bits ^= low
+    return keys
+
+def pair_keys(pairs):
+    """Bitset of the S-DES keys encrypting x to y for every (x, y) in pairs"""
+    index = get_pair_index()
+    keys = ALL_KEYS
+    for x, y in pairs:
+        keys &= index[x][y]
+        if not keys:
+            break
+    return keys
+
+def known_plaintext_keys(plaintext, ciphertext):
+    """Recovers every S-DES key mapping plaintext to ciphertext
+
+    Args:
+        plaintext: Known plaintext bytes.
+        ciphertext: The corresponding ciphertext bytes, a few suffice.
+
+    Returns:
+        List of int keys (see val_to_bits).
+    """
+    return bitset_keys(pair_keys(set(zip(plaintext, ciphertext))))
+
+def meet_in_the_middle(plaintext, ciphertext):
+    """Recovers every TripleSDES key mapping plaintext to ciphertext
+
+    Args:
+        plaintext: Known plaintext bytes.
+        ciphertext: The corresponding ciphertext bytes, a few suffice.
+
+    Returns:
+        List of 20 bit keys (K1 in the high bits, see decrypt_3DES_int).
+    """
+    enc, dec = get_codebook()
+    pairs = set(zip(plaintext, ciphertext))
+    keys = []
+    for K1 in range(2**10):
+        E1 = enc[K1*256:(K1+1)*256]
+        D1 = dec[K1*256:(K1+1)*256]
+        candidates = pair_keys((D1[c], E1[p]) for p, c in pairs)
+        keys += [(K1 << 10) | K2 for K2 in bitset_keys(candidates)]
+    return keys
+
+def crack_3des_mitm(data, crib):
+    """Meet-in-the-middle crack of ciphertext bytes whose plaintext starts with crib
+
+    Returns:
+        List of (key, plaintext) tuples, like the multiprocessing brute force.
+    """
+    if not crib:
+        raise ValueError('crib must not be empty') # It would match all 2^20 keys
+    if not data:
+        return []
+    n = min(len(crib), len(data))
+    keys = meet_in_the_middle(crib[:n], data[:n])
+    return [(K, codebook_decrypt_3DES(K, data).decode('latin-1')) for K in keys]
+
+
+# Bitsliced S-DES. Every bit is a lane: a Python int whose bit j belongs to
+# key j of a batch, so one pass through the circuit below evaluates the
+# whole batch. The list based permutations (P10, IP, EP, ...) work on lanes
+# unchanged, only XOR and the S-boxes need lane versions.
+def bitslice_keys(keys, n=10):
+    """Transposes integer keys into n lanes, lane i holding bit i (MSB first) of every key"""
+    keys = np.asarray(keys, dtype=np.uint32)
+    lanes = []
+    for i in range(n):
+        bits = ((keys >> (n-1-i)) & 1).astype(np.uint8)
+        lanes.append(int.from_bytes(np.packbits(bits, bitorder='little').tobytes(), 'little'))
+    return lanes
+
+def block_lanes(val, mask):
+    """Broadcasts a block (int) to all lanes"""
+    return [mask if b else 0 for b in val_to_bits(val, return_len=8)]
+
+def XOR_lanes(bits_0, bits_1):
+    return [i ^ j for i, j in zip(bits_0, bits_1)]
+
+def S_box_lanes(box, bits, mask):
+    """Evaluates an S-box on 4 lanes as a sum of its 16 minterms"""
+    b0, b1, b2, b3 = bits
+    n0, n1, n2, n3 = b0 ^ mask, b1 ^ mask, b2 ^ mask, b3 ^ mask
+    hi = [n0 & n1, n0 & b1, b0 & n1, b0 & b1] # indexed by (bit_1, bit_2)
+    lo = [n2 & n3, n2 & b3, b2 & n3, b2 & b3] # indexed by (bit_3, bit_4)
+    out = [0, 0]
+    for v in range(16):
+        r = ((v >> 2) & 2) | (v & 1)
+        c = (v >> 1) & 3
+        minterm = hi[v >> 2] & lo[v & 3]
+        for i, bit in enumerate(box[r][c]):
+            if bit:
+                out[i] |= minterm
+    return out
+
+def sdes_round_lanes(inp, K, mask):
+    out = XOR_lanes(EP(inp[4:]), K)
+    out = P4(S_box_lanes(S0, out[:4], mask) + S_box_lanes(S1, out[4:], mask))
+    return XOR_lanes(inp[:4], out) + inp[4:]
+
+def encrypt_lanes(K, plaintext, mask):
+    K1,K2 = generate_key(K)
+    round_1 = sdes_round_lanes(IP(plaintext), K1, mask)
+    round_2 = sdes_round_lanes(SW(round_1), K2, mask)
+    return IP_inverse(round_2)
+
+def decrypt_lanes(K, ciphertext, mask):
+    K1,K2 = generate_key(K)
+    round_1 = sdes_round_lanes(IP(ciphertext), K2, mask)
+    round_2 = sdes_round_lanes(SW(round_1), K1, mask)
+    return IP_inverse(round_2)
+
+def decrypt_3DES_lanes(K, ciphertext, mask):
+    return decrypt_lanes(K[:10], encrypt_lanes(K[10:], decrypt_lanes(K[:10], ciphertext, mask), mask), mask)
+
+def is_letter_lanes(bits, mask):
+    """Lanes holding an ASCII letter: 010xxxxx or 011xxxxx with xxxxx in 1-26"""
+    p0, p1, _, p3, p4, p5, p6, p7 = bits
+    nonzero = p3 | p4 | p5 | p6 | p7
+    above_26 = p3 & p4 & (p5 | (p6 & p7))
+    return (p0 ^ mask) & p1 & nonzero & (above_26 ^ mask)
+
+def bitsliced_search(data, keys, decrypt_fn, key_bits):
+    if not len(data):
+        return [] # Like key_check, an empty text matches no key
+    keys = np.asarray(keys, dtype=np.uint32)
+    mask = (1 << len(keys)) - 1
+    K = bitslice_keys(keys, n=key_bits)
+    alive = mask
+    for c in bytes(data):
+        alive &= is_letter_lanes(decrypt_fn(K, block_lanes(c, mask), mask), mask)
+        if not alive:
+            return []
+    return [int(keys[j]) for j in bitset_keys(alive)]
+
+def key_check_bitsliced(data, keys=range(2**10)):
+    """Bitsliced key_check over many keys at once
+
+    Args:
+        data: Ciphertext bytes.
+        keys: Integer keys to test.
+
+    Returns:
+        List of (key, plaintext) tuples for the keys giving letters only.
+    """
+    found = bitsliced_search(data, keys, decrypt_lanes, key_bits=10)
+    return [(K, codebook_decrypt(K, data).decode()) for K in found]
+
+def key_check_3des_bitsliced(data, start=0, stop=2**20, batch=2**16):
+    """Bitsliced key_check_3des over the 20 bit keys [start, stop) in batches of lanes"""
+    res = []
+    for i in range(start, stop, batch):
+        for K in bitsliced_search(data, range(i, min(i + batch, stop)), decrypt_3DES_lanes, key_bits=20):
+            res.append((K, codebook_decrypt_3DES(K, data).decode()))
+    return res
+
+
 def binary_to_ascii(s):
     """Slice every 8 bit and convert it"""
     chunks = chunk(s, n=8)
@@ -221,13 +757,25 @@ def key_check(key, chunks):
 
 
 
-with open('CTX2.txt') as f:
-    ctx2 = f.read()
-    ctx2 = [int(i) for i in ctx2]
-    chunks2 = chunk(ctx2, n=8)
+CTX_DIR = os.path.dirname(os.path.abspath(__file__))
 
-    
-def key_check_3des(key, chunks=chunks2):
+
+@functools.lru_cache(maxsize=None)
+def load_ciphertext(name):
+    """Reads a ciphertext bit file (e.g. CTX2.txt) on first use
+
+    Args:
+        name: File name, relative to this module unless absolute.
+
+    Returns:
+        Tuple of 8 bit chunks.
+    """
+    with open(os.path.join(CTX_DIR, name)) as f:
+        ctx = [int(i) for i in f.read().strip()]
+    return tuple(chunk(ctx, n=8))
+
+
+def key_check_3des(key, chunks):
     res = []
     for _chunk in chunks:
         dec_str = ''.join(str(i) for i in decrypt_3DES(key, _chunk))
@@ -240,12 +788,84 @@ def key_check_3des(key, chunks=chunks2):
     return key, ''.join(res)
 
 
+
+# Streaming TripleSDES pool search. Workers get small integer key ranges
+# and share a stop event, so the key space is never materialized and every
+# worker exits as soon as one of them finds the key. The ciphertext is
+# handed to each worker once by the pool initializer instead of being
+# pickled with every task.
+_stop_event = None
+_worker_chunks = None
+
+
+def _init_worker(stop_event, chunks):
+    global _stop_event, _worker_chunks
+    _stop_event = stop_event
+    _worker_chunks = chunks
+
+def key_ranges(start=0, stop=2**20, size=2**12):
+    """Lazily yields (start, stop) integer key ranges covering [start, stop)"""
+    for i in range(start, stop, size):
+        yield i, min(i + size, stop)
+
+def key_check_3des_range(key_range, chunks=None, check_every=64):
+    """Runs key_check_3des over an integer key range, on the worker's chunks by default
+
+    Returns:
+        Tuple (keys tried, key, decoded text), key being None and the
+        text False if no key in the range matched or the search was stopped.
+    """
+    if chunks is None:
+        chunks = _worker_chunks
+    start, stop = key_range
+    for K in range(start, stop):
+        if _stop_event is not None and (K - start) % check_every == 0 and _stop_event.is_set():
+            return K - start, None, False
+        key, decoded_text = key_check_3des(val_to_bits(K, return_len=20), chunks)
+        if decoded_text:
+            if _stop_event is not None:
+                _stop_event.set()
+            return K - start + 1, key, decoded_text
+    return stop - start, None, False
+
+def print_progress(tried, elapsed, total):
+    print(f'{tried}/{total} keys tried, {tried/max(elapsed, 1e-9):.0f} keys/s')
+
+def search_3des(chunks, start=0, stop=2**20, processes=None, range_size=2**12,
+                progress=print_progress, report_every=1.0):
+    """Multiprocessing TripleSDES brute force over the integer keys [start, stop)
+
+    Args:
+        chunks: Ciphertext as a list of 8 bit chunks.
+        processes: Number of workers, defaults to the cpu count.
+        range_size: Keys handed to a worker per task.
+        progress: Called as progress(tried, elapsed, total) at most every
+            report_every seconds, total being stop - start. None disables
+            reporting.
+
+    Returns:
+        Tuple (key, decoded text, keys tried), key being None and the text
+        False if no key matched.
+    """
+    stop_event = multiprocessing.Event()
+    tried = 0
+    start_time = last_report = time.time()
+    with Pool(processes, initializer=_init_worker, initargs=(stop_event, chunks)) as pool:
+        for n, key, decoded_text in pool.imap_unordered(key_check_3des_range, key_ranges(start, stop, range_size)):
+            tried += n
+            if decoded_text:
+                return key, decoded_text, tried
+            now = time.time()
+            if progress is not None and now - last_report >= report_every:
+                progress(tried, now - start_time, stop - start)
+                last_report = now
+    return None, False, tried
+
 if __name__ == "__main__":
 
-    with open('CTX1.txt') as f:
-        ctx1 = f.read()
-        ctx1 = [int(i) for i in ctx1]
-        chunks = chunk(ctx1, n=8)
+    chunks = load_ciphertext('CTX1.txt')
+    ctx1 = [b for c in chunks for b in c]
+    chunks2 = load_ciphertext('CTX2.txt')
 
     inp = input("Verify SDES implementation? (y/n):")
     if inp == "y":
@@ -270,39 +890,32 @@ if __name__ == "__main__":
 
     inp = input("Crack CTX1 with SDES? (y/n):")
     if inp == "y":
-        keys = [val_to_bits(i, return_len=10) for i in range(2**10)]
         start_time = time.time()
-        for key in keys:
-            pos_key = key_check(key, chunks)
-            if pos_key:
-                print(pos_key)
-                print(key)
-                break
-                
+        for key, pos_key in crack_sdes(bits_to_bytes(ctx1)):
+            print(pos_key)
+            print(val_to_bits(key, return_len=10))
+
         print("--- %s seconds ---" % (time.time() - start_time))
         print()
 
     inp = input("Crack CTX2 with TripleSDES (Multiprocessing)? (y/n):")
     if inp == "y":
-        # Generate all possible keys
         start_time = time.time()
-        keys = [val_to_bits(i, return_len=10) for i in range(2**10)]
-        keys_3des = []
-        for key1 in keys:
-            for key2 in keys:
-                keys_3des.append(key1+key2)
-        
-        time_spent = time.time() - start_time
-        print(f'Spent {time_spent:.5f}s generating all {len(keys_3des)} possible keys')
+        key, decoded_text, tried = search_3des(chunks2)
+        if decoded_text:
+            print(key)
+            print(decoded_text)
+        print(f'Tried {tried} keys')
+        print("--- %s seconds ---" % (time.time() - start_time))
 
+    inp = input("Crack CTX2 with TripleSDES (Meet-in-the-middle)? (y/n):")
+    if inp == "y":
+        crib = b''
+        while not crib:
+            crib = input("Known or guessed start of the plaintext:").encode()
         start_time = time.time()
-        chunksize = int(len(keys) / multiprocessing.cpu_count())
-        with multiprocessing.Pool() as pool:
-            for key, decoded_text in pool.imap_unordered(func=key_check_3des, iterable=keys_3des, chunksize = chunksize):
-                if decoded_text:
-                    print(key)
-                    print(decoded_text)
-                    break
-                    
-                    
-        print("--- %s seconds ---" % (time.time() - start_time))
\ No newline at end of file
+        for key, decoded_text in crack_3des_mitm(bytes(bits_to_val(c) for c in chunks2), crib):
+            print(val_to_bits(key, return_len=20))
+            print(decoded_text)
+
+        print("--- %s seconds ---" % (time.time() - start_time))
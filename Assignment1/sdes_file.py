@@ -0,0 +1,136 @@
+import os
+import io
+import sys
+import mmap
+import time
+import argparse
+import numpy as np
+from sdes import codebook_tables, codebook_3DES_tables
+
+BUFFER_SIZE = 2**20 # 1 MB
+MODES = ['ecb', 'cbc']
+
+
+def get_tables(key, triple=False):
+    """Encrypt and decrypt table for a 10 bit (S-DES) or 20 bit (TripleSDES) int key"""
+    if triple:
+        return codebook_3DES_tables(key)
+    return tuple(bytes(t) for t in codebook_tables(key))
+
+def read_buffers(src, buffer_size=BUFFER_SIZE, use_mmap=False):
+    """Yields the content of a binary file object in fixed-size buffers
+
+    With use_mmap the file is memory-mapped and the buffers are sliced out
+    of the mapping instead of being read.
+    """
+    if use_mmap:
+        if os.fstat(src.fileno()).st_size == 0:
+            return
+        with mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for i in range(0, len(mm), buffer_size):
+                yield mm[i:i+buffer_size]
+        return
+    while True:
+        buf = src.read(buffer_size)
+        if not buf:
+            return
+        yield buf
+
+def cbc_encrypt_buffer(buf, enc, prev):
+    """CBC encrypts a buffer, prev being the last ciphertext byte (or IV)"""
+    out = bytearray(len(buf))
+    for i, p in enumerate(bytes(buf)):
+        prev = enc[p ^ prev]
+        out[i] = prev
+    return bytes(out), prev
+
+def cbc_decrypt_buffer(buf, dec, prev):
+    buf = bytes(buf)
+    plain = np.frombuffer(buf.translate(dec), dtype=np.uint8)
+    chain = np.frombuffer(bytes([prev]) + buf[:-1], dtype=np.uint8)
+    return (plain ^ chain).tobytes(), buf[-1]
+
+def encrypt_stream(src, dst, key, mode='ecb', triple=False, iv=None,
+                   buffer_size=BUFFER_SIZE, use_mmap=False):
+    """Encrypts the binary file object src into dst with constant memory
+
+    Args:
+        key: Int key, 10 bits for S-DES or 20 bits (K1 in the high bits)
+            for TripleSDES.
+        mode: 'ecb' or 'cbc'. In CBC mode the one byte IV is written first.
+        iv: CBC IV, random if None.
+
+    Returns:
+        Number of plaintext bytes processed.
+    """
+    enc, _ = get_tables(key, triple)
+    n = 0
+    if mode == 'cbc':
+        prev = os.urandom(1)[0] if iv is None else iv
+        dst.write(bytes([prev]))
+    for buf in read_buffers(src, buffer_size, use_mmap):
+        if mode == 'cbc':
+            out, prev = cbc_encrypt_buffer(buf, enc, prev)
+        else:
+            out = bytes(buf).translate(enc)
+        dst.write(out)
+        n += len(buf)
+    return n
+
+def decrypt_stream(src, dst, key, mode='ecb', triple=False,
+                   buffer_size=BUFFER_SIZE, use_mmap=False):
+    """Reverses encrypt_stream, returns the number of ciphertext bytes processed"""
+    _, dec = get_tables(key, triple)
+    n = 0
+    prev = None
+    for buf in read_buffers(src, buffer_size, use_mmap):
+        if mode == 'cbc':
+            if prev is None:
+                prev, buf = buf[0], buf[1:]
+                n += 1
+                if not len(buf):
+                    continue
+            out, prev = cbc_decrypt_buffer(buf, dec, prev)
+        else:
+            out = bytes(buf).translate(dec)
+        dst.write(out)
+        n += len(buf)
+    return n
+
+def encrypt_data(data, key, mode='ecb', triple=False, iv=None):
+    dst = io.BytesIO()
+    encrypt_stream(io.BytesIO(data), dst, key, mode=mode, triple=triple, iv=iv)
+    return dst.getvalue()
+
+def decrypt_data(data, key, mode='ecb', triple=False):
+    dst = io.BytesIO()
+    decrypt_stream(io.BytesIO(data), dst, key, mode=mode, triple=triple)
+    return dst.getvalue()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Encrypt or decrypt files with S-DES or TripleSDES')
+    parser.add_argument('action', choices=['encrypt', 'decrypt'])
+    parser.add_argument('input', help='Input file')
+    parser.add_argument('output', help='Output file')
+    parser.add_argument('--key', required=True, help='10 bit (S-DES) or 20 bit (TripleSDES) key, e.g. 1000101110')
+    parser.add_argument('--mode', choices=MODES, default='ecb')
+    parser.add_argument('--buffer-size', type=int, default=BUFFER_SIZE, help='Bytes processed per buffer')
+    parser.add_argument('--mmap', action='store_true', help='Memory-map the input file')
+    args = parser.parse_args()
+
+    if len(args.key) not in (10, 20) or set(args.key) - {'0', '1'}:
+        parser.error('--key must be a string of 10 or 20 bits')
+    key = int(args.key, 2)
+    triple = len(args.key) == 20
+
+    start_time = time.time()
+    with open(args.input, 'rb') as src, open(args.output, 'wb') as dst:
+        if args.action == 'encrypt':
+            n = encrypt_stream(src, dst, key, mode=args.mode, triple=triple,
+                               buffer_size=args.buffer_size, use_mmap=args.mmap)
+        else:
+            n = decrypt_stream(src, dst, key, mode=args.mode, triple=triple,
+                               buffer_size=args.buffer_size, use_mmap=args.mmap)
+    elapsed = time.time() - start_time
+    print(f'{args.action}ed {n} bytes in {elapsed:.3f}s ({n / 1e6 / max(elapsed, 1e-9):.2f} MB/s)', file=sys.stderr)
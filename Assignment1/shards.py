@@ -0,0 +1,257 @@
+import os
+import json
+import time
+import socket
+import argparse
+import threading
+import socketserver
+import multiprocessing
+from sdes import load_ciphertext, bits_to_val, key_check_3des_bitsliced
+
+SHARD_SIZE = 2**14
+LEASE_TIMEOUT = 300 # Seconds before a shard handed to a silent worker is handed out again
+
+
+class Coordinator:
+    """Hands out numbered shards of the TripleSDES key space and collects results
+
+    Completed shards are written to the checkpoint file after every result,
+    so a restarted coordinator only hands out the unfinished ones.
+
+    Args:
+        data: Ciphertext bytes.
+        checkpoint: Optional path of the JSON checkpoint file.
+        start, stop: Key range [start, stop) to search.
+        shard_size: Keys per shard.
+        stop_on_match: Stop handing out shards once a key is found.
+    """
+    def __init__(self, data, checkpoint=None, start=0, stop=2**20, shard_size=SHARD_SIZE,
+                 stop_on_match=False, lease_timeout=LEASE_TIMEOUT):
+        self.data = bytes(data)
+        self.checkpoint = checkpoint
+        self.start = start
+        self.stop = stop
+        self.shard_size = shard_size
+        self.n_shards = (stop - start + shard_size - 1) // shard_size
+        self.stop_on_match = stop_on_match
+        self.lease_timeout = lease_timeout
+        self.done = {} # shard -> [[key, plaintext], ...]
+        self.leases = {} # shard -> time handed out
+        self.workers = {} # worker -> [keys tried, seconds spent]
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+        self.start_time = time.time()
+        if checkpoint is not None and os.path.exists(checkpoint):
+            self.load()
+        self.check_finished()
+
+    def config(self):
+        return {'ciphertext': self.data.hex(), 'start': self.start, 'stop': self.stop,
+                'shard_size': self.shard_size}
+
+    def load(self):
+        with open(self.checkpoint) as f:
+            state = json.load(f)
+        if state['config'] != self.config():
+            raise ValueError(f'{self.checkpoint} belongs to a different search')
+        self.done = {int(shard): found for shard, found in state['done'].items()}
+
+    def save(self):
+        if self.checkpoint is None:
+            return
+        tmp = self.checkpoint + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'config': self.config(), 'done': self.done}, f)
+        os.replace(tmp, self.checkpoint)
+
+    def found(self):
+        return sorted(tuple(r) for found in self.done.values() for r in found)
+
+    def check_finished(self):
+        if len(self.done) == self.n_shards or (self.stop_on_match and self.found()):
+            self.finished.set()
+
+    def shard_range(self, shard):
+        start = self.start + shard * self.shard_size
+        return start, min(start + self.shard_size, self.stop)
+
+    def next_shard(self):
+        """Next shard to hand out: a fresh one, else one whose lease expired"""
+        with self.lock:
+            if self.finished.is_set():
+                return None
+            now = time.time()
+            for shard in range(self.n_shards):
+                if shard in self.done:
+                    continue
+                leased = self.leases.get(shard)
+                if leased is None or now - leased > self.lease_timeout:
+                    self.leases[shard] = now
+                    return shard
+            return None
+
+    def check_done(self, msg):
+        """Reason to reject a done message, None if it reports a shard handed out"""
+        shard = msg.get('shard')
+        if type(shard) is not int or not 0 <= shard < self.n_shards:
+            return f'shard must be an int in range({self.n_shards})'
+        for field in ('keys', 'elapsed'):
+            if type(msg.get(field)) not in (int, float):
+                return f'{field} must be a number'
+        if not isinstance(msg.get('found'), list):
+            return 'found must be a list'
+        with self.lock:
+            if shard not in self.leases:
+                return f'shard {shard} is not handed out'
+        return None
+
+    def complete(self, shard, found, keys, elapsed, worker):
+        with self.lock:
+            self.leases.pop(shard, None)
+            if shard not in self.done:
+                self.done[shard] = found
+                stats = self.workers.setdefault(worker, [0, 0.0])
+                stats[0] += keys
+                stats[1] += elapsed
+                self.save()
+            self.check_finished()
+
+    def stats(self):
+        """Aggregated throughput of this run across all workers"""
+        with self.lock:
+            keys = sum(k for k, _ in self.workers.values())
+            elapsed = time.time() - self.start_time
+            return {
+                'shards_done': len(self.done),
+                'shards_total': self.n_shards,
+                'keys_tried': keys,
+                'keys_per_sec': keys / elapsed if elapsed > 0 else 0,
+                'workers': {w: {'keys_tried': k, 'keys_per_sec': k / s if s > 0 else 0}
+                            for w, (k, s) in self.workers.items()},
+            }
+
+    def handle(self, msg):
+        """Answers one message of the line based JSON protocol"""
+        if msg.get('op') == 'get':
+            shard = self.next_shard()
+            if shard is None:
+                return {'shard': None, 'finished': self.finished.is_set()}
+            start, stop = self.shard_range(shard)
+            return {'shard': shard, 'start': start, 'stop': stop, 'ciphertext': self.data.hex()}
+        if msg.get('op') == 'done':
+            error = self.check_done(msg)
+            if error:
+                return {'error': error}
+            self.complete(msg['shard'], msg['found'], msg['keys'], msg['elapsed'], msg.get('worker', '?'))
+            return {'ok': True}
+        if msg.get('op') == 'stats':
+            return self.stats()
+        return {'error': f'unknown op {msg.get("op")}'}
+
+
+class Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                msg = json.loads(line)
+                if not isinstance(msg, dict):
+                    raise ValueError('message must be a JSON object')
+                reply = self.server.coordinator.handle(msg)
+            except (ValueError, KeyError, TypeError) as e:
+                reply = {'error': f'malformed message: {e!r}'}
+            self.wfile.write(json.dumps(reply).encode() + b'\n')
+            self.wfile.flush()
+
+
+class Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def serve(coordinator, host='localhost', port=0):
+    """Starts the coordinator in a background thread, returns the server"""
+    server = Server((host, port), Handler)
+    server.coordinator = coordinator
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def run_worker(host, port, name=None, retry_wait=1.0):
+    """Searches shards from the coordinator at (host, port) until it has none left
+
+    A closed connection also counts as finished, the coordinator shuts down
+    as soon as the search is over (e.g. with stop_on_match).
+    """
+    name = name or f'{socket.gethostname()}-{os.getpid()}'
+    with socket.create_connection((host, port)) as sock:
+        f = sock.makefile('rwb')
+        def request(msg):
+            try:
+                f.write(json.dumps(msg).encode() + b'\n')
+                f.flush()
+                line = f.readline()
+            except ConnectionError:
+                return None
+            return json.loads(line) if line else None
+
+        while True:
+            shard = request({'op': 'get', 'worker': name})
+            if shard is None:
+                return
+            if shard['shard'] is None:
+                if shard['finished']:
+                    return
+                time.sleep(retry_wait) # Remaining shards are leased to others
+                continue
+            start_time = time.time()
+            found = key_check_3des_bitsliced(bytes.fromhex(shard['ciphertext']), shard['start'], shard['stop'])
+            if request({'op': 'done', 'shard': shard['shard'], 'found': found, 'worker': name,
+                        'keys': shard['stop'] - shard['start'], 'elapsed': time.time() - start_time}) is None:
+                return
+
+def run_coordinator(coordinator, host='localhost', port=0, local_workers=0, report_every=5.0):
+    """Serves coordinator, optionally with local worker processes, until finished
+
+    Progress is printed every report_every seconds. Remote workers connect
+    with run_worker (or `python shards.py worker`).
+    """
+    server = serve(coordinator, host, port)
+    host, port = server.server_address
+    procs = [multiprocessing.Process(target=run_worker, args=(host, port, f'local-{i}'))
+             for i in range(local_workers)]
+    for p in procs:
+        p.start()
+    while not coordinator.finished.wait(report_every):
+        print(coordinator.stats())
+    for p in procs:
+        p.join()
+    server.shutdown()
+    server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Sharded, checkpointed TripleSDES key search')
+    sub = parser.add_subparsers(dest='role', required=True)
+    coord = sub.add_parser('coordinator')
+    coord.add_argument('--ctx', default='CTX2.txt', help='Ciphertext bit file')
+    coord.add_argument('--checkpoint', default='shards_checkpoint.json')
+    coord.add_argument('--shard-size', type=int, default=SHARD_SIZE)
+    coord.add_argument('--host', default='localhost')
+    coord.add_argument('--port', type=int, default=5010)
+    coord.add_argument('--local-workers', type=int, default=0, help='Worker processes to start on this machine')
+    coord.add_argument('--stop-on-match', action='store_true')
+    worker = sub.add_parser('worker')
+    worker.add_argument('--host', default='localhost')
+    worker.add_argument('--port', type=int, default=5010)
+    args = parser.parse_args()
+
+    if args.role == 'worker':
+        run_worker(args.host, args.port)
+    else:
+        data = bytes(bits_to_val(c) for c in load_ciphertext(args.ctx))
+        coordinator = Coordinator(data, checkpoint=args.checkpoint, shard_size=args.shard_size,
+                                  stop_on_match=args.stop_on_match)
+        print(f'{len(coordinator.done)}/{coordinator.n_shards} shards already done')
+        run_coordinator(coordinator, args.host, args.port, args.local_workers)
+        print(coordinator.stats())
+        for key, plaintext in coordinator.found():
+            print(key, plaintext)
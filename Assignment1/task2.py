@@ -1,4 +1,4 @@
-from kasisky import ALPHABET, decipher, encipher, get_key_lens, frequency_analysis, candidate_keys
+from kasiski import ALPHABET, decipher, encipher, get_key_lens, rank_shifts
 import matplotlib.pyplot as plt
 import time
 import os
@@ -38,8 +38,7 @@ if __name__ == "__main__":
     x = []
     for key_len in range(5, 1000, 10):
         start_time = time.time()
-        L, lf = frequency_analysis(doc, key_len)
-        keys = candidate_keys(lf)
+        shifts, scores = rank_shifts(doc, key_len)
         _ex_time = (time.time() - start_time)
         print(f'Time spent for key length {key_len}: {_ex_time:.5f}s')
         key_len_times.append(_ex_time)
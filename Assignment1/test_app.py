@@ -0,0 +1,97 @@
+import time
+import sdes
+import jobs
+from app import app, RAW_KEY_1, RAW_KEY_2
+
+PLAINTEXT = b'simplifieddesisnotsecureenoughtoprovideyousufficientsecurity'
+K1, K2 = sdes.bits_to_val(RAW_KEY_1), sdes.bits_to_val(RAW_KEY_2)
+
+
+def test_cipher_formats():
+    client = app.test_client()
+    ciphertext = sdes.encrypt_3DES_bytes(K1, K2, PLAINTEXT)
+    bits = ''.join(str(b) for b in sdes.bytes_to_bits(ciphertext))
+    assert client.get('/cipher', query_string={'ciphertext': bits}).data == PLAINTEXT
+    assert client.post('/cipher', data=ciphertext).data == PLAINTEXT
+    assert client.post('/cipher?format=hex', data=ciphertext.hex()).data == PLAINTEXT
+    assert client.post('/cipher?format=bits', data=bits).data == PLAINTEXT
+    assert client.get('/cipher', query_string={'ciphertext': '0101'}).status_code == 400
+
+
+def test_cipher_streams_large_input():
+    client = app.test_client()
+    plaintext = PLAINTEXT * 5000
+    ciphertext = sdes.encrypt_3DES_bytes(K1, K2, plaintext)
+    assert client.post('/cipher?format=hex', data=ciphertext.hex()).data == plaintext
+    assert client.post('/cipher', data=ciphertext).data == plaintext
+
+
+def test_crack_job():
+    client = app.test_client()
+    ciphertext = sdes.encrypt_bytes(642, b'BackgroundJob')
+    bits = ''.join(str(b) for b in sdes.bytes_to_bits(ciphertext))
+    resp = client.post('/crack', json={'ciphertext': bits, 'cipher': 'sdes'})
+    assert resp.status_code == 202
+    job_id = resp.get_json()['id']
+    status = None
+    for _ in range(100):
+        status = client.get(f'/crack/{job_id}').get_json()
+        if status['status'] == 'done':
+            break
+        time.sleep(0.1)
+    assert status['status'] == 'done'
+    assert status['keys_tried'] == 2**10
+    assert {'key': '1010000010', 'plaintext': 'BackgroundJob'} in status['results']
+    assert client.get('/crack/unknown').status_code == 404
+    assert client.post('/crack', json={'ciphertext': bits, 'cipher': 'aes'}).status_code == 400
+
+
+def test_cipher_returns_raw_bytes():
+    client = app.test_client()
+    plaintext = bytes([0xc8, 0x41]) + bytes(range(256))
+    ciphertext = sdes.encrypt_3DES_bytes(K1, K2, plaintext)
+    for resp in (client.post('/cipher', data=ciphertext),
+                 client.post('/cipher?format=hex', data=ciphertext.hex()),
+                 client.post('/cipher?format=hex', data=(ciphertext * 300).hex())):
+        assert resp.mimetype == 'application/octet-stream'
+        assert resp.data.startswith(plaintext)
+
+
+def test_crack_rejects_empty_and_caps_results():
+    client = app.test_client()
+    for cipher in ('sdes', '3des'):
+        assert client.post('/crack', json={'ciphertext': '', 'cipher': cipher}).status_code == 400
+    found, total = jobs.run_crack('sdes', b'a', {}, 'job')
+    assert total > jobs.MAX_RESULTS and len(found) == jobs.MAX_RESULTS
+
+
+def wait_done(crack_jobs, job_id):
+    for _ in range(100):
+        if crack_jobs.status(job_id)['status'] == 'done':
+            return
+        time.sleep(0.1)
+
+
+def test_finished_jobs_are_evicted():
+    crack_jobs = jobs.CrackJobs(max_workers=1, max_finished=1)
+    try:
+        first = crack_jobs.submit('sdes', sdes.encrypt_bytes(642, b'first'))
+        wait_done(crack_jobs, first)
+        second = crack_jobs.submit('sdes', sdes.encrypt_bytes(642, b'second'))
+        wait_done(crack_jobs, second)
+        assert crack_jobs.status(first) is None # Only the newest finished job is kept
+        assert first not in crack_jobs.progress
+        assert crack_jobs.status(second)['status'] == 'done'
+        assert crack_jobs.pending() == 0
+        crack_jobs.finished_ttl = 0
+        time.sleep(0.01)
+        assert crack_jobs.status(second) is None
+        assert not crack_jobs.jobs and not crack_jobs.progress
+    finally:
+        crack_jobs.shutdown()
+
+
+def test_crack_rejects_malformed_bodies():
+    client = app.test_client()
+    for body in ([1, 2], {'ciphertext': 12, 'format': 'hex'}, {'ciphertext': ['0101'], 'cipher': 'sdes'}):
+        assert client.post('/crack', json=body).status_code == 400
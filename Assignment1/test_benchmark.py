@@ -0,0 +1,39 @@
+import benchmark
+
+
+def test_compare_flags_regressions():
+    baseline = {'results': {
+        'crack': {'value': 1.0, 'higher_is_better': False},
+        'bulk': {'value': 100.0, 'higher_is_better': True},
+        'removed': {'value': 1.0, 'higher_is_better': False},
+    }}
+    results = {'results': {
+        'crack': {'value': 1.2, 'higher_is_better': False},
+        'bulk': {'value': 50.0, 'higher_is_better': True},
+    }}
+    assert benchmark.compare(results, baseline, threshold=0.25) == [('bulk', 0.5)]
+    assert [name for name, _ in benchmark.compare(results, baseline, threshold=0.1)] == ['crack', 'bulk']
+
+
+def test_run_emits_results():
+    results = benchmark.run('block.*.int', quick=True, workers=())
+    assert set(results['results']) == {'block.encrypt.int', 'block.decrypt.int'}
+    assert results['results']['block.encrypt.int']['unit'] == 's'
+
+
+def test_import_benchmark():
+    for module in ('sdes', 'app', 'kasiski'):
+        seconds, max_rss = benchmark.measure_import(module)
+        assert 0 < seconds < 10 and max_rss > 0
+    results = benchmark.run('import.sdes*', quick=True, workers=())
+    assert set(results['results']) == {'import.sdes', 'import.sdes.max_rss'}
+
+
+def test_pool_benchmarks_report_worker_memory():
+    # The Flask import subprocess is larger than a pool worker and must not leak into its figure
+    benchmark.run('import.app', quick=True, workers=())
+    _, app_rss = benchmark.measure_import('app')
+    results = benchmark.run('search_3des.*', quick=True, workers=(1,))
+    result = results['results']['search_3des.workers_1']
+    assert result['memory_source'] == 'worker_max_rss'
+    assert 2**20 < result['peak_memory'] < app_rss * 1024
@@ -0,0 +1,139 @@
+import os
+import sys
+import subprocess
+import itertools
+import pytest
+import kasiski
+
+CIPHER_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cipher.txt')
+
+with open(CIPHER_FILE) as f:
+    DOC = ''.join(f.read().split())
+
+
+def test_repeated_ngrams():
+    assert kasiski.get_repeated_ngrams('ABCXABCYAB', 5) == {2: [[0, 4, 8], [1, 5]], 3: [[0, 4]]}
+    ngram = kasiski.get_ngram('ABCXABCYAB', 2)
+    assert sorted(kasiski.get_ngram_distances(ngram)) == [4, 4, 4, 8]
+
+
+def test_key_lens():
+    key_lens = kasiski.get_key_lens(10, DOC)
+    assert key_lens == {2: 358, 4: 324, 8: 280, 3: 178, 6: 138, 7: 92, 9: 71, 5: 60, 10: 37}
+    assert list(key_lens) == [2, 4, 8, 3, 6, 7, 9, 5, 10]
+
+
+def test_factor_frequencies_match_factor_lists():
+    doc = kasiski.encipher('ABCDAB' * 20 + DOC[:200], 'KEY') # Both frequent and rare repeats
+    repeats = kasiski.get_repeated_ngrams(doc, 12)
+    freqs = kasiski.get_factor_frequencies(repeats, 12, len(doc))
+    factors = [f for groups in repeats.values() for idx in groups
+               for d in kasiski.get_distances(idx) for f in kasiski.get_factors(d, limit=12)]
+    assert [int(freqs[k]) for k in range(2, 13)] == [factors.count(k) for k in range(2, 13)]
+
+
+def test_key_lens_ic():
+    key_lens = kasiski.get_key_lens_ic(20, DOC)
+    assert list(key_lens)[:2] == [8, 16]
+    assert len(key_lens) == 19
+    counts = kasiski.column_counts(kasiski.encode('ABAB'), 2)
+    assert counts[:, :2].tolist() == [[2, 0], [0, 2]]
+    assert kasiski.index_of_coincidence(counts).tolist() == [1.0, 1.0]
+    assert kasiski.encode('abZ').tolist() == [0, 1, 25]
+    for doc in ('ABC abc', 'AB1', 'ßA'):
+        with pytest.raises(ValueError):
+            kasiski.get_key_lens_ic(3, doc)
+
+
+def test_rank_shifts():
+    shifts, scores = kasiski.rank_shifts(DOC, 8)
+    assert ''.join(kasiski.ALPHABET[s] for s in shifts[:, 0]) == 'BDLAEKCY'
+    assert (scores[:, :-1] <= scores[:, 1:]).all()
+    shifts, scores = kasiski.rank_shifts('ABC', 5) # Empty columns score 0
+    assert shifts.shape == scores.shape == (5, 26)
+    assert not scores[3:].any()
+
+
+def test_best_keys():
+    shifts, scores = kasiski.rank_shifts(DOC, 8)
+    keys = list(itertools.islice(kasiski.best_keys(shifts, scores), 2000))
+    assert keys[0][0] == 'BDLAEKCY'
+    assert keys[0][1] == pytest.approx(scores[:, 0].sum())
+    assert len({key for key, _ in keys}) == 2000
+    assert all(a[1] <= b[1] for a, b in zip(keys, keys[1:]))
+
+    shifts, scores = kasiski.rank_shifts(DOC[:100], 3) # Small enough to enumerate fully
+    keys = list(kasiski.best_keys(shifts, scores))
+    assert len({key for key, _ in keys}) == 26**3
+    assert all(a[1] <= b[1] + 1e-9 for a, b in zip(keys, keys[1:]))
+
+
+def test_stopword_scoring():
+    assert kasiski.trie_regex(['AND', 'ANY', 'ARE']) == 'A(?:N(?:D|Y)|RE)'
+    assert kasiski.stopword_count('THEMANDTHE') == 3
+    decoder = kasiski.ColumnDecoder(DOC, 8)
+    for key in ['BDLAEKCY', 'BDLAEKCZ', 'ADLAEKCZ']:
+        assert decoder.decipher(key).decode() == kasiski.decipher(DOC, key)
+    keys, counts = kasiski.get_top_candidates(DOC, ['BDLAEKCY', 'BDLAAKCY', 'AAAAAAAA'], k=2)
+    assert keys == ['BDLAEKCY', 'BDLAAKCY']
+    assert counts[0] > counts[1]
+
+
+def test_vigenere():
+    assert kasiski.encipher('ATTACKATDAWN', 'LEMON') == 'LXFOPVEFRNHR'
+    assert kasiski.decipher('LXFOPVEFRNHR', 'LEMON') == 'ATTACKATDAWN'
+    assert kasiski.decipher(DOC, 'BDLAEKCY').startswith('ANORIGINALMESSAGE')
+    assert kasiski.decipher('lxfopvefrnhr', 'lemon') == 'ATTACKATDAWN'
+    for doc, key in (('ABC', 'K3Y'), ('ABC', ''), ('ABC', 'KÉY'), ('ÅBC', 'KEY')):
+        with pytest.raises(ValueError):
+            kasiski.decipher(doc, key)
+
+
+def test_vigenere_stream(tmp_path):
+    src, dst = tmp_path / 'cipher.txt', tmp_path / 'plain.txt'
+    with open(CIPHER_FILE) as f:
+        src.write_text(f.read())
+    kasiski.vigenere_file(src, dst, 'BDLAEKCY', chunk_size=37) # Chunks split lines and key periods
+    assert dst.read_text() == kasiski.decipher(DOC, 'BDLAEKCY')
+    chunks = list(kasiski.vigenere_chunks(['ATTAC', 'KAT DA', 'WN'], 'LEMON', decrypt=False))
+    assert ''.join(chunks) == 'LXFOPVEFRNHR'
+
+
+def test_hill_climb():
+    assert kasiski.hill_climb(DOC, 'AAAAAAAA')[0] == 'BDLAEKCY'
+    plain = kasiski.decipher(DOC, 'BDLAEKCY')
+    doc = kasiski.encipher(plain * 2, 'THISISAMUCHLONGERKEY') # Only ~57 letters per column
+    key, score = kasiski.solve(doc, 20)
+    assert key == 'THISISAMUCHLONGERKEY'
+    assert score == pytest.approx(kasiski.fitness(plain * 2))
+    assert score > kasiski.fitness(doc)
+
+
+def test_parallel_matches_serial():
+    assert kasiski.ngram_ranges(10, 4) == [(2, 4), (5, 7), (8, 10)]
+    key_lens = kasiski.get_key_lens_parallel(10, DOC, processes=2)
+    assert list(key_lens.items()) == list(kasiski.get_key_lens(10, DOC).items())
+    candidates = kasiski.get_top_candidates_parallel(DOC, [8, 4], k=2, n_keys=100, processes=2)
+    assert list(candidates) == [8, 4]
+    keys = (key for key, _ in itertools.islice(kasiski.best_keys(*kasiski.rank_shifts(DOC, 8)), 100))
+    assert candidates[8] == kasiski.get_top_candidates(DOC, keys, k=2)
+
+
+def test_resources_load_lazily(tmp_path):
+    # Importing must neither need nltk nor read the data files
+    code = ('import sys, kasiski; assert "nltk" not in sys.modules; '
+            'assert kasiski.get_stopwords.cache_info().currsize == 0; '
+            'assert kasiski.get_quadgrams.cache_info().currsize == 0')
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(kasiski.__file__)))
+    subprocess.run([sys.executable, '-c', code], cwd=tmp_path, env=env, check=True)
+    assert 'THE' in kasiski.STOPWORDS and isinstance(kasiski.STOPWORDS, frozenset)
+    assert kasiski.EN_WF[4] == 12.702 / 100
+    assert kasiski.get_quadgrams() == pytest.approx(kasiski.get_quadgrams(kasiski.CORPUS_FILE))
+
+
+def test_nltk_stopwords_match_bundled():
+    pytest.importorskip('nltk')
+    try:
+        assert kasiski.get_stopwords('nltk') == kasiski.get_stopwords()
+    except LookupError:
+        pytest.skip('NLTK stopwords corpus not downloaded')
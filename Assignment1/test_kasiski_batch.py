@@ -0,0 +1,49 @@
+import io
+import os
+import json
+import kasiski
+import kasiski_batch
+
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cipher.txt')) as f:
+    PLAIN = kasiski.decipher(''.join(f.read().split()), 'BDLAEKCY')
+KEYS = ['LEMON', 'BDLAEKCY', 'THISISAKEY', 'Q']
+
+
+def test_choose_key_len():
+    for key in KEYS[:3]:
+        assert kasiski_batch.choose_key_len(kasiski.encipher(PLAIN, key)) == len(key)
+    assert kasiski_batch.choose_key_len('ABCDEFGHIJ') == 1 # Too short for any column statistics
+    assert kasiski_batch.shortest_period('ABAB') == 'AB'
+
+
+def test_crack_jsonl_stream():
+    lines = [json.dumps({'id': key, 'ciphertext': kasiski.encipher(PLAIN, key).lower()}) for key in KEYS]
+    docs = kasiski_batch.read_jsonl(io.StringIO('\n'.join(lines) + '\n'))
+    results = list(kasiski_batch.crack_all(docs, processes=2, kasiski=True))
+    assert [res['id'] for res in results] == KEYS
+    assert [res['key'] for res in results] == KEYS
+    assert set(results[0]['timings']) == {'key_len', 'kasiski', 'solve', 'score'}
+    assert results[0]['stopwords'] == kasiski.stopword_count(PLAIN)
+
+
+def test_crack_directory(tmp_path):
+    (tmp_path / 'a.txt').write_text(kasiski.encipher(PLAIN, 'LEMON'))
+    (tmp_path / 'b.txt').write_text('')
+    results = list(kasiski_batch.crack_all(kasiski_batch.read_directory(tmp_path), processes=1, plaintext=True))
+    assert results[0]['id'] == 'a.txt' and results[0]['plaintext'] == PLAIN
+    assert results[1]['id'] == 'b.txt'
+
+
+def test_bad_input_becomes_error_records(tmp_path):
+    good = json.dumps({'id': 'good', 'ciphertext': kasiski.encipher(PLAIN, 'LEMON')})
+    lines = [good.encode(), b'not json', b'{"id": "nocipher"}', b'[1]', b'\xff\xfe', good.encode()]
+    stream = io.BytesIO(b'\n'.join(lines) + b'\n')
+    results = list(kasiski_batch.crack_all(kasiski_batch.read_jsonl(stream), processes=1))
+    assert [res['id'] for res in results] == ['good', 1, 2, 3, 4, 'good']
+    assert results[0]['key'] == results[-1]['key'] == 'LEMON'
+    assert all('error' in res for res in results[1:-1])
+
+    (tmp_path / 'a.txt').write_bytes(b'\xff\xfe not utf-8')
+    (tmp_path / 'b.txt').write_text(kasiski.encipher(PLAIN, 'LEMON'))
+    results = list(kasiski_batch.crack_all(kasiski_batch.read_directory(tmp_path), processes=1))
+    assert 'UnicodeDecodeError' in results[0]['error'] and results[1]['key'] == 'LEMON'
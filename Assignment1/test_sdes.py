@@ -0,0 +1,154 @@
+import os
+import sys
+import subprocess
+import pytest
+import sdes
+
+
+def test_int_engine_matches_reference():
+    for K in range(0, 2**10, 7):
+        key = sdes.val_to_bits(K, return_len=10)
+        for b in range(256):
+            block = sdes.val_to_bits(b, return_len=8)
+            assert sdes.encrypt_int(K, b) == sdes.bits_to_val(sdes.encrypt(key, block))
+            assert sdes.decrypt_int(K, b) == sdes.bits_to_val(sdes.decrypt(key, block))
+
+
+def test_int_engine_3des_matches_reference():
+    k1 = [1,0,0,0,1,0,1,1,1,0]
+    k2 = [0,1,1,0,1,0,1,1,1,0]
+    K1, K2 = sdes.bits_to_val(k1), sdes.bits_to_val(k2)
+    for b in range(256):
+        block = sdes.val_to_bits(b, return_len=8)
+        assert sdes.encrypt_3DES_int(K1, K2, b) == sdes.bits_to_val(sdes.encrypt_3DES(k1, k2, block))
+        assert sdes.decrypt_3DES_int((K1 << 10) | K2, b) == sdes.bits_to_val(sdes.decrypt_3DES(k1 + k2, block))
+
+
+def test_bytes_roundtrip():
+    data = b'Hello TripleSDES'
+    assert sdes.decrypt_bytes(642, sdes.encrypt_bytes(642, data)) == data
+    enc = sdes.encrypt_3DES_bytes(558, 430, data)
+    assert sdes.decrypt_3DES_bytes((558 << 10) | 430, enc) == data
+    assert sdes.bytes_to_bits(sdes.bits_to_bytes(sdes.bytes_to_bits(data))) == sdes.bytes_to_bits(data)
+
+
+def test_codebook_matches_engine(tmp_path):
+    enc, dec = sdes.build_codebook()
+    for K in (0, 1, 642, 1023):
+        assert enc[K*256:(K+1)*256] == sdes.encrypt_table(K)
+        assert dec[K*256:(K+1)*256] == sdes.decrypt_table(K)
+    path = str(tmp_path / 'codebook.bin')
+    sdes.load_codebook(path)  # Written on first load
+    mm_enc, mm_dec = sdes.load_codebook(path)  # Memory-mapped
+    assert mm_enc.tobytes() == enc and mm_dec.tobytes() == dec
+    sdes.load_codebook()
+
+
+def test_codebook_lookups():
+    data = b'CodebookLookups'
+    ctx = sdes.codebook_encrypt(642, data)
+    assert ctx == sdes.encrypt_bytes(642, data)
+    assert sdes.codebook_decrypt(642, ctx) == data
+    assert sdes.codebook_key_check(642, ctx) == 'CodebookLookups'
+    assert sdes.codebook_key_check(642, sdes.encrypt_bytes(642, b'not letters!')) is False
+    ctx3 = sdes.codebook_encrypt_3DES(558, 430, data)
+    assert ctx3 == sdes.encrypt_3DES_bytes(558, 430, data)
+    assert sdes.codebook_key_check_3des((558 << 10) | 430, ctx3) == ((558 << 10) | 430, 'CodebookLookups')
+
+
+def test_crack_sdes():
+    data = sdes.encrypt_bytes(642, b'VectorizedCracking')
+    found = sdes.crack_sdes(data)
+    assert (642, 'VectorizedCracking') in found
+    for K, plaintext in found:
+        assert sdes.key_check(sdes.val_to_bits(K, return_len=10), sdes.chunk(sdes.bytes_to_bits(data))) == plaintext
+    batch = [data, sdes.encrypt_bytes(7, b'abc'), sdes.encrypt_bytes(9, b'xyz')]
+    results = sdes.crack_sdes_batch(batch)
+    assert results[0] == found
+    assert results[1] == sdes.crack_sdes(batch[1])
+    assert (9, 'xyz') in results[2]
+    assert sdes.crack_sdes(b'') == [] # key_check finds no key for an empty text
+    assert sdes.crack_sdes_batch([b'', b'']) == [[], []]
+
+
+def test_meet_in_the_middle():
+    K = (558 << 10) | 430
+    data = sdes.codebook_encrypt_3DES(558, 430, b'meetinthemiddle')
+    keys = sdes.meet_in_the_middle(b'meet', data[:4])
+    assert K in keys
+    for key in keys:
+        assert sdes.codebook_encrypt_3DES(key >> 10, key & 0x3ff, b'meet') == data[:4]
+    assert (K, 'meetinthemiddle') in sdes.crack_3des_mitm(data, b'meetin')
+    with pytest.raises(ValueError):
+        sdes.crack_3des_mitm(data, b'')
+    assert sdes.crack_3des_mitm(b'', b'meetin') == []
+
+
+def test_search_3des_stops_on_match():
+    K = (558 << 10) | 430
+    chunks = sdes.chunk(sdes.bytes_to_bits(sdes.codebook_encrypt_3DES(558, 430, b'StopAllWorkers')))
+    key, decoded_text, tried = sdes.search_3des(chunks, start=K - 1000, stop=K + 5000,
+                                                processes=2, range_size=256, progress=None)
+    assert key == sdes.val_to_bits(K, return_len=20)
+    assert decoded_text == 'StopAllWorkers'
+    assert tried < 6000
+    assert list(sdes.key_ranges(0, 10, 4)) == [(0, 4), (4, 8), (8, 10)]
+
+
+def test_search_3des_reports_range_total():
+    chunks = sdes.chunk(sdes.bytes_to_bits(sdes.codebook_encrypt_3DES(558, 430, b'NoMatchInThisRange')))
+    reports = []
+    sdes.search_3des(chunks, start=0, stop=2048, processes=1, range_size=256,
+                     progress=lambda *args: reports.append(args), report_every=0)
+    assert reports and all(total == 2048 for _, _, total in reports)
+
+
+def test_bitsliced_matches_vectorized():
+    data = sdes.encrypt_bytes(300, b'Bitsliced')
+    assert sdes.key_check_bitsliced(data) == sdes.crack_sdes(data)
+    short = sdes.encrypt_bytes(300, b'Bit')
+    assert sdes.key_check_bitsliced(short) == sdes.crack_sdes(short)
+    assert sdes.key_check_bitsliced(b'') == []
+    assert sdes.key_check_3des_bitsliced(b'', stop=2**12) == []
+    K = (558 << 10) | 430
+    data = sdes.codebook_encrypt_3DES(558, 430, b'BitslicedTriple')
+    assert sdes.key_check_3des_bitsliced(data, start=K - 5000, stop=K + 5000, batch=4096) == [(K, 'BitslicedTriple')]
+
+
+def test_known_plaintext_keys():
+    data = b'known'
+    keys = sdes.known_plaintext_keys(data, sdes.encrypt_bytes(642, data))
+    assert 642 in keys
+    assert keys == [K for K in range(2**10) if sdes.encrypt_bytes(K, data) == sdes.encrypt_bytes(642, data)]
+    assert sdes.known_plaintext_keys(b'', b'') == list(range(2**10))
+
+
+def test_import_does_not_read_ciphertexts(tmp_path):
+    # Importers and pool workers may run from any directory
+    code = 'import sdes; assert sdes.load_ciphertext.cache_info().currsize == 0'
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(sdes.__file__)))
+    subprocess.run([sys.executable, '-c', code], cwd=tmp_path, env=env, check=True)
+    assert len(sdes.load_ciphertext('CTX2.txt')) == 60
+
+
+def test_scoring():
+    assert sdes.score_plaintext(b'letters', 'letters') == 0.0
+    assert sdes.score_plaintext(b'two words', 'letters') is None
+    assert sdes.score_plaintext(b'two words', 'printable') == 0.0
+    english = sdes.score_plaintext(b'the quick brown fox', 'bigram')
+    assert english > sdes.score_plaintext(b'xqz jvkqw zxqjv kxq', 'bigram')
+    assert sdes.score_plaintext(b'the quick brown fox', 'bigram', bound=english + 1) is None
+    dec = sdes.decrypt_all_keys(sdes.encrypt_bytes(642, b'scored rows'))
+    scores = sdes.score_rows(dec, 'unigram')
+    assert scores[642] == sdes.score_plaintext(dec[642].tobytes(), 'unigram')
+
+
+def test_rank_keys():
+    data = sdes.encrypt_bytes(642, b'the plaintext has spaces, so key_check rejects it.')
+    assert sdes.rank_keys(data, 'letters') == []
+    ranked = sdes.rank_keys(data, 'bigram', top=5)
+    assert ranked[0][0] == 642 and ranked[0][2].startswith('the plaintext')
+    assert [r[1] for r in ranked] == sorted((r[1] for r in ranked), reverse=True)
+    K = (558 << 10) | 430
+    data = sdes.codebook_encrypt_3DES(558, 430, b'ranked triple sdes keys')
+    assert sdes.rank_keys_3des(data, 'unigram', top=3)[0][:1] == (K,)
@@ -0,0 +1,25 @@
+import io
+import sdes
+import sdes_file
+
+
+def test_ecb_matches_engine():
+    data = bytes(range(256)) * 10
+    assert sdes_file.encrypt_data(data, 642) == sdes.encrypt_bytes(642, data)
+    K = (558 << 10) | 430
+    assert sdes_file.encrypt_data(data, K, triple=True) == sdes.encrypt_3DES_bytes(558, 430, data)
+
+
+def test_cbc_roundtrip_across_buffers(tmp_path):
+    data = b'CBC mode chains every byte to the previous one. ' * 100
+    for key, triple in ((642, False), ((558 << 10) | 430, True)):
+        enc = sdes_file.encrypt_data(data, key, mode='cbc', triple=triple, iv=0x5a)
+        assert enc[0] == 0x5a and len(enc) == len(data) + 1
+        assert sdes_file.decrypt_data(enc, key, mode='cbc', triple=triple) == data
+        # Chaining has to carry over buffer boundaries, also when memory-mapped
+        path = tmp_path / 'enc.bin'
+        path.write_bytes(enc)
+        dst = io.BytesIO()
+        with open(path, 'rb') as src:
+            sdes_file.decrypt_stream(src, dst, key, mode='cbc', triple=triple, buffer_size=7, use_mmap=True)
+        assert dst.getvalue() == data
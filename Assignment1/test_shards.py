@@ -0,0 +1,74 @@
+import json
+import socket
+import threading
+import sdes
+import shards
+
+K = (558 << 10) | 430
+DATA = sdes.codebook_encrypt_3DES(558, 430, b'ShardedSearch')
+
+
+def test_sharded_search_resumes_from_checkpoint(tmp_path):
+    checkpoint = str(tmp_path / 'checkpoint.json')
+    start, stop = K - 2**13, K + 2**13
+    coordinator = shards.Coordinator(DATA, checkpoint, start=start, stop=stop, shard_size=2**12)
+    shards.run_coordinator(coordinator, local_workers=2, report_every=0.1)
+    assert (K, 'ShardedSearch') in coordinator.found()
+    stats = coordinator.stats()
+    assert stats['shards_done'] == 4 and stats['keys_tried'] == 2**14
+
+    resumed = shards.Coordinator(DATA, checkpoint, start=start, stop=stop, shard_size=2**12)
+    assert resumed.finished.is_set()
+    assert resumed.next_shard() is None
+    assert resumed.found() == coordinator.found()
+
+
+def test_expired_leases_are_handed_out_again():
+    coordinator = shards.Coordinator(DATA, start=0, stop=3, shard_size=1, lease_timeout=60)
+    assert [coordinator.next_shard() for _ in range(4)] == [0, 1, 2, None]
+    coordinator.complete(1, [], 1, 0.1, 'w')
+    coordinator.leases[0] -= 120 # Worker went silent
+    assert coordinator.handle({'op': 'get'})['shard'] == 0
+    assert coordinator.handle({'op': 'get'}) == {'shard': None, 'finished': False}
+
+
+def test_malformed_messages_get_an_error_reply():
+    coordinator = shards.Coordinator(DATA, start=0, stop=4, shard_size=2)
+    server = shards.serve(coordinator)
+    try:
+        with socket.create_connection(server.server_address) as sock:
+            f = sock.makefile('rwb')
+            for line in (b'not json\n', b'[1, 2]\n', b'{"op": "done"}\n', b'{"op": "stats"}\n'):
+                f.write(line)
+                f.flush()
+                reply = json.loads(f.readline())
+                assert ('error' in reply) == (line != b'{"op": "stats"}\n')
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_worker_stops_when_coordinator_closes():
+    listener = socket.create_server(('localhost', 0))
+    def accept_and_close():
+        conn, _ = listener.accept()
+        conn.close()
+    thread = threading.Thread(target=accept_and_close)
+    thread.start()
+    shards.run_worker(*listener.getsockname()[:2]) # Returns instead of raising
+    thread.join()
+    listener.close()
+
+
+def test_done_only_accepted_for_handed_out_shards():
+    coordinator = shards.Coordinator(DATA, start=0, stop=4, shard_size=2)
+    done = {'op': 'done', 'shard': 0, 'found': [], 'keys': 2, 'elapsed': 0.1}
+    for bad in ({'shard': '0'}, {'shard': 99}, {'shard': 0}, {'shard': True}):
+        assert 'error' in coordinator.handle({**done, **bad}) # Shard 0 is not handed out yet
+    assert coordinator.next_shard() == 0
+    for bad in ({'keys': '2'}, {'elapsed': None}, {'found': 'none'}):
+        assert 'error' in coordinator.handle({**done, **bad})
+    assert coordinator.done == {} and not coordinator.finished.is_set()
+    assert coordinator.handle(done) == {'ok': True}
+    assert 'error' in coordinator.handle(done) # Already completed
+    assert list(coordinator.done) == [0] and not coordinator.finished.is_set()